@@ -0,0 +1,154 @@
+import hashlib
+import math
+import random
+import time
+from urllib.parse import urlencode
+
+from decouple import config
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from base.utils.single_flight import single_flight, SINGLE_FLIGHT_LOCK_TIMEOUT
+from base.utils.tiered_cache import get_tiered_cache
+
+CACHED_RESPONSE_TIMEOUT = config(
+    "CACHED_RESPONSE_TIMEOUT", cast=int, default=3600
+)  # seconds, model signals bump the namespace version long before that
+CACHED_RESPONSE_EARLY_REFRESH_BETA = config(
+    "CACHED_RESPONSE_EARLY_REFRESH_BETA", cast=float, default=1.0
+)  # > 1 refreshes earlier, 0 turns early refresh off
+
+
+def should_refresh_early(entry, beta=CACHED_RESPONSE_EARLY_REFRESH_BETA):
+    """
+    XFetch: هرچه به انقضا نزدیک‌تر و ساخت کندتر باشد، احتمال ساخت زودتر بیشتر است
+    """
+    # 1 - random() is in (0, 1], log() never sees 0
+    gap = -entry["delta"] * beta * math.log(1.0 - random.random())
+    return time.time() + gap >= entry["expires"]
+
+
+class CachedResponseMixin:
+    """
+    کش پاسخ رندر شده (bytes) برای endpointهای فقط خواندنی
+    در cache hit نه کوئری اجرا می‌شود نه serializer و renderer
+    ETag از نسخه namespace ساخته می‌شود، If-None-Match برابر --> 304
+    cache_namespace --> namespace کش دو لایه، سیگنال مدل‌ها آن را invalidate می‌کنند
+    """
+
+    cache_namespace = None
+    cache_timeout = CACHED_RESPONSE_TIMEOUT
+    cache_early_refresh_beta = CACHED_RESPONSE_EARLY_REFRESH_BETA
+
+    def get_response_cache_key(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        signature = "|".join(
+            (
+                request.path,
+                query,
+                getattr(self, "action", None) or request.method,
+                request.accepted_renderer.format,
+            )
+        )
+        return hashlib.sha1(signature.encode()).hexdigest()
+
+    def _build_entry(self, request, compute):
+        started = time.monotonic()
+        response = self.finalize_response(request, compute())
+        response.render()
+        delta = time.monotonic() - started
+        now = time.time()
+        return {
+            "status": response.status_code,
+            "content_type": response["Content-Type"],
+            "body": response.content,
+            "delta": delta,
+            "expires": now + self.cache_timeout,
+            # the data has not changed since the namespace version this entry is built on
+            "modified": int(now),
+        }
+
+    def _rebuild(self, request, compute, tiered_cache, key):
+        entry = self._build_entry(request, compute)
+        # errors are not cached
+        if entry["status"] == 200:
+            tiered_cache.set(key, entry, self.cache_timeout)
+        return entry
+
+    def cached_response(self, request, compute):
+        """
+        compute --> تابع بدون آرگومان که Response را برمی‌گرداند (فقط در cache miss)
+        """
+        if request.accepted_renderer.format == "api":
+            # the browsable api page has the user and a csrf token in it
+            return compute()
+
+        tiered_cache = get_tiered_cache(self.cache_namespace)
+        key = self.get_response_cache_key(request)
+        version = tiered_cache.version()
+        # W/, a compressed body is still the same representation
+        etag = "W/" + quote_etag(f"{version}-{key[:16]}")
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            # If-None-Match matched, no entry is read at all
+            return self._conditional_headers(not_modified, etag)
+
+        entry = tiered_cache.get(key)
+        flight_key = f"cached_response:{self.cache_namespace}:{version}:{key}"
+
+        if entry is None:
+            # one rebuild per key, concurrent requests wait for its result
+            entry = single_flight(
+                flight_key, self._rebuild, request, compute, tiered_cache, key
+            )
+        elif should_refresh_early(entry, self.cache_early_refresh_beta):
+            # only one request refreshes, the others keep the current entry
+            refresh_key = f"{flight_key}:refresh"
+            if cache.add(refresh_key, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+                try:
+                    entry = self._rebuild(request, compute, tiered_cache, key)
+                finally:
+                    cache.delete(refresh_key)
+
+        response = HttpResponse(
+            entry["body"], status=entry["status"], content_type=entry["content_type"]
+        )
+        if entry["status"] != 200:
+            return response
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=entry["modified"],
+            response=response,
+        )
+        return self._conditional_headers(response, etag, entry["modified"])
+
+    def _conditional_headers(self, response, etag, modified=None):
+        response["ETag"] = etag
+        if modified is not None:
+            response["Last-Modified"] = http_date(modified)
+        # clients keep the body but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CachedListRetrieveMixin(CachedResponseMixin):
+    """
+    برای ReadOnlyModelViewSet، list و retrieve از کش خوانده می‌شوند
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(CachedListRetrieveMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(CachedListRetrieveMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
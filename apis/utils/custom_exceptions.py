@@ -33,6 +33,12 @@ class HttpStatusException(APIException):
     default_code = "invalid_request"
 
 
+class UpstreamServerErrorException(APIException):
+    status_code = 502
+    default_detail = "سرویس خارجی با خطای سرور پاسخ داد لطفا کمی بعد دوباره تلاش کنید"
+    default_code = "upstream_server_error"
+
+
 class UserExistsException(APIException):
     status_code = 400
     default_detail = "کاربر از قبل وجود دارد میتواند به حساب خود وارد شود"
@@ -99,3 +105,21 @@ class TripPermissionException(APIException):
     status_code = 403
     default_code = "trip_permission"
     default_detail = 'سفری که لغو شده هست و اجازه تغییر ان را ندارید'
+
+
+class ServiceUnavailableException(APIException):
+    status_code = 503
+    default_code = "service_unavailable"
+    default_detail = "سرویس در حال حاضر در دسترس نیست لطفا کمی بعد دوباره تلاش کنید"
+
+
+class TripAlreadyTakenException(APIException):
+    status_code = 409
+    default_code = "trip_already_taken"
+    default_detail = "این سفر توسط راننده دیگری پذیرفته شده یا دیگر در دسترس نیست"
+
+
+class OfferExpiredException(APIException):
+    status_code = 410
+    default_code = "offer_expired"
+    default_detail = "زمان پذیرش این سفر به پایان رسیده است"
@@ -1,13 +1,153 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core import signing
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apis.utils.custom_response import response
+from base.utils.paginator import ApproximateCountPaginator
 
 
 class CustomPagination(PageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
     page_size = 20
     max_page_size = 100
     page_query_param = "page"
 
 
 class LatestItemPagination(PageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 30
+
+
+class KeysetPagination(BasePagination):
+    """
+    صفحه بندی با cursor روی id (جدیدترین اول)، بدون COUNT و OFFSET
+    cursor امضا شده است و قابل دستکاری نیست
+    ترتیب همیشه بر اساس id است، ordering دیگر در view یا queryset مجاز نیست
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    signing_salt = "apis.utils.paginations.KeysetPagination"
+    allowed_ordering = ("id", "-id", "pk", "-pk")
+
+    def encode_cursor(self, position, reverse):
+        cursor = signing.dumps([position, int(reverse)], salt=self.signing_salt)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            position, reverse = signing.loads(cursor, salt=self.signing_salt)
+            return int(position), bool(reverse)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError(
+                {self.cursor_query_param: self.invalid_cursor_message}
+            )
+
+    def check_ordering(self, queryset, view):
+        ordering = getattr(view, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        ordering = (*ordering, *queryset.query.order_by)
+        assert all(field in self.allowed_ordering for field in ordering), (
+            f"{self.__class__.__name__} always orders by id, "
+            f"{view.__class__.__name__} orders by {ordering}"
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        self.check_ordering(queryset, view)
+
+        if reverse:
+            queryset = queryset.filter(id__gt=position).order_by("id")
+        elif position is not None:
+            queryset = queryset.filter(id__lt=position).order_by("-id")
+        else:
+            queryset = queryset.order_by("-id")
+
+        # one extra row tells if there is another page
+        results = list(queryset[: page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_url = self.previous_url = None
+        if results:
+            first, last = results[0].id, results[-1].id
+            if has_more or reverse:
+                self.next_url = self.encode_cursor(last, reverse=False)
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_url = self.encode_cursor(first, reverse=True)
+        elif position is not None:
+            # past either end, a link back to the first page
+            self.previous_url = remove_query_param(
+                self.base_url, self.cursor_query_param
+            )
+        return results
+
+    def get_paginated_response(self, data):
+        return response(
+            success=True,
+            result={
+                "next": self.next_url,
+                "previous": self.previous_url,
+                "results": data,
+            },
+            error=False,
+            status_code=200,
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "success": {"type": "boolean"},
+                "error": {"type": "boolean"},
+                "result": {
+                    "type": "object",
+                    "properties": {
+                        "next": {"type": "string", "nullable": True, "format": "uri"},
+                        "previous": {
+                            "type": "string",
+                            "nullable": True,
+                            "format": "uri",
+                        },
+                        "results": schema,
+                    },
+                },
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "integer"},
+            },
+        ]
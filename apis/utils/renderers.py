@@ -0,0 +1,55 @@
+import logging
+
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    # once per process, the api is several times slower to render this way
+    logging.warning("orjson is not installed, api json falls back to drf")
+
+# Decimal, datetime, lazy translation strings, QuerySet ... the same way as drf
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer با orjson (datetime, UUID و dict در C)، بدون orjson همان رندرر drf
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+
+        options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # orjson only knows 2 spaces
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=_encoder.default, option=options)
+        # same as drf, safe to embed in a <script> tag
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    پاسخ باینری msgpack برای اپ موبایل (Accept: application/msgpack)
+    همان داده JSON، انواع غیر پایه مثل JSON به رشته یا عدد تبدیل می‌شوند
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=True)
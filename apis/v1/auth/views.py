@@ -37,6 +37,8 @@ from apis.v1.auth.serializers import (
     CarModelSerializer,
     VerifyForgetPasswordSerializer,
 )
+from apis.utils.cached_views import CachedListRetrieveMixin
+from apis.utils.delta_sync import DeltaSyncMixin
 from apis.utils.custom_exceptions import (
     UserExistsException,
     PasswordNotMathException,
@@ -51,7 +53,7 @@ from apis.utils.custom_permissions import (
 from apis.utils.custom_response import response
 from apis.utils.custome_throttle import OtpRateThrottle
 from apis.utils.get_ip import get_client_ip
-from apis.utils.paginations import CustomPagination
+from apis.utils.paginations import KeysetPagination
 from apps.auth_app.models import (
     User,
     UserNotification,
@@ -295,16 +297,20 @@ class RequestForgetPasswordView(AsyncAPIView):
 
 
 class UserNotificationView(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    DeltaSyncMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     """
-    pagination --> max_item in page --> 1000 \n
-    default item in page --> 20
+    pagination --> cursor (next / previous), max_item in page --> 100 \n
+    default item in page --> 20 \n
+    sync --> تغییرات از watermark قبلی (?since=)
     """
 
     serializer_class = UserNotificationSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return UserNotification.objects.filter(user_id=self.request.user.id).only(
@@ -314,6 +320,11 @@ class UserNotificationView(
             "updated_at",
         )
 
+    def get_sync_queryset(self):
+        return self.get_queryset().only(
+            "title", "body", "is_active", "created_at", "updated_at"
+        )
+
 
 class UploadImageView(APIView):
     serializer_class = UploadImageSerializer
@@ -596,11 +607,16 @@ class VerifyRequestVerifiedPhoneView(AsyncAPIView):
             raise e
 
 
-class CarBrandViewSet(viewsets.ReadOnlyModelViewSet):
+class CarBrandViewSet(
+    DeltaSyncMixin, CachedListRetrieveMixin, viewsets.ReadOnlyModelViewSet
+):
     """
     دریافت لیست برندهای خودرو
+    sync --> تغییرات از watermark قبلی (?since=)
     """
 
+    # invalidated by the CarBrand signals
+    cache_namespace = "car_brand"
     serializer_class = CarBrandSerializer
     permission_classes = (IsAuthenticated,)
     queryset = CarBrand.objects.filter(is_active=True)
@@ -609,13 +625,21 @@ class CarBrandViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ["brand_name", "created_at"]
     ordering = ("brand_name",)
 
+    def get_sync_queryset(self):
+        return CarBrand.objects.all()
+
 
-class CarModelViewSet(viewsets.ReadOnlyModelViewSet):
+class CarModelViewSet(
+    DeltaSyncMixin, CachedListRetrieveMixin, viewsets.ReadOnlyModelViewSet
+):
     """
     دریافت لیست مدل‌های خودرو
     می‌توانید با پارامتر brand=id فیلتر کنید
+    sync --> تغییرات از watermark قبلی (?since=)
     """
 
+    # invalidated by the CarModel and CarBrand signals
+    cache_namespace = "car_model"
     serializer_class = CarModelSerializer
     permission_classes = (IsAuthenticated,)
     queryset = CarModel.objects.filter(is_active=True).select_related("brand")
@@ -625,6 +649,9 @@ class CarModelViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ("model_name", "brand__brand_name", "created_at")
     ordering = ("brand__brand_name", "model_name")
 
+    def get_sync_queryset(self):
+        return CarModel.objects.select_related("brand")
+
 
 class VerifyForgetPasswordView(APIView):
     serializer_class = VerifyForgetPasswordSerializer
@@ -32,12 +32,22 @@ from .serializers import (
     OrderItemSerializer,
     AddOrderItemSerializer,
 )
+from apis.utils.cached_views import CachedListRetrieveMixin
+from apis.utils.delta_sync import DeltaSyncMixin
 from apis.utils.custom_permissions import IsOwnerProductComment
-from apis.utils.paginations import CustomPagination, LatestItemPagination
+from apis.utils.paginations import (
+    CustomPagination,
+    LatestItemPagination,
+    KeysetPagination,
+)
 
 
-class ShopCategoryViewSet(ReadOnlyModelViewSet):
+class ShopCategoryViewSet(
+    DeltaSyncMixin, CachedListRetrieveMixin, ReadOnlyModelViewSet
+):
     serializer_class = ShopCategorySerializer
+    # invalidated by the Category signals
+    cache_namespace = "shop_category"
     queryset = (
         Category.objects.filter(is_active=True)
         .select_related("parent")
@@ -52,6 +62,9 @@ class ShopCategoryViewSet(ReadOnlyModelViewSet):
         .select_related("category_image")
     )
 
+    def get_sync_queryset(self):
+        return Category.objects.select_related("parent", "category_image")
+
 
 class RecommenderProductView(ListAPIView):
     serializer_class = RecommenderProductSerializer
@@ -222,7 +235,7 @@ class DetailProductView(RetrieveAPIView):
 class ProductCommentViewSet(ModelViewSet):
     serializer_class = ProductCommentSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerProductComment)
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
     lookup_field = "id"
 
     def get_queryset(self):
@@ -248,6 +261,7 @@ class ProductCommentViewSet(ModelViewSet):
 
 
 class OrderViewSet(
+    DeltaSyncMixin,
     ListModelMixin,
     RetrieveModelMixin,
     DestroyModelMixin,
@@ -264,6 +278,9 @@ class OrderViewSet(
             return OrderSerializer
 
     def get_queryset(self):
+        return self.get_sync_queryset().filter(is_active=True).order_by("-id")
+
+    def get_sync_queryset(self):
         item_fields = (
             "quantity",
             "order_id",
@@ -273,27 +290,20 @@ class OrderViewSet(
         )
         p_img_fields = ("product_id", "image__image")
 
-        return (
-            Order.objects.filter(
-                is_active=True,
-                user_id=self.request.user.id,
-            )
-            .order_by("-id")
-            .prefetch_related(
-                Prefetch(
-                    "order_items",
-                    queryset=OrderItem.objects.filter(is_active=True)
-                    .select_related("product")
-                    .only(*item_fields),
-                ),
-                Prefetch(
-                    "order_items__product__product_image",
-                    queryset=ProductImage.objects.select_related("image")
-                    .only(*p_img_fields)
-                    .order_by("order")
-                    .filter(is_active=True),
-                ),
-            )
+        return Order.objects.filter(user_id=self.request.user.id).prefetch_related(
+            Prefetch(
+                "order_items",
+                queryset=OrderItem.objects.filter(is_active=True)
+                .select_related("product")
+                .only(*item_fields),
+            ),
+            Prefetch(
+                "order_items__product__product_image",
+                queryset=ProductImage.objects.select_related("image")
+                .only(*p_img_fields)
+                .order_by("order")
+                .filter(is_active=True),
+            ),
         )
 
     def perform_destroy(self, instance):
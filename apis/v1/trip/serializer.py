@@ -1,9 +1,20 @@
 from rest_framework.exceptions import NotFound
-from rest_framework.serializers import ModelSerializer, Serializer, FloatField
+from rest_framework.serializers import (
+    ModelSerializer,
+    Serializer,
+    FloatField,
+    IntegerField,
+    ValidationError,
+)
 
 from apis.utils.custom_exceptions import TripPermissionException
 from apps.auth_app.models import Passenger
 from apps.trip_app.models import TripType, Trip
+from apps.trip_app.services.nearby import (
+    NEARBY_DRIVERS_RADIUS_KM,
+    NEARBY_DRIVERS_MAX_RADIUS_KM,
+    NEARBY_DRIVERS_MAX_K,
+)
 
 
 class TripTypeSerializer(ModelSerializer):
@@ -17,6 +28,62 @@ class ReverseGeocodeSerializer(Serializer):
     lng = FloatField()
 
 
+class BatchReverseGeocodeSerializer(Serializer):
+    points = ReverseGeocodeSerializer(many=True, min_length=1, max_length=50)
+
+
+class DriverLocationPingSerializer(Serializer):
+    lat = FloatField(min_value=-90, max_value=90)
+    lng = FloatField(min_value=-180, max_value=180)
+    ts = FloatField(required=False, help_text="unix timestamp of the ping")
+
+
+class DriverLocationSerializer(Serializer):
+    pings = DriverLocationPingSerializer(many=True, min_length=1, max_length=100)
+
+
+class NearbyDriversSerializer(Serializer):
+    trip = IntegerField(required=False, help_text="search around trip origin")
+    lat = FloatField(required=False, min_value=-90, max_value=90)
+    lng = FloatField(required=False, min_value=-180, max_value=180)
+    radius_km = FloatField(
+        default=NEARBY_DRIVERS_RADIUS_KM,
+        min_value=0.1,
+        max_value=NEARBY_DRIVERS_MAX_RADIUS_KM,
+    )
+    k = IntegerField(default=10, min_value=1, max_value=NEARBY_DRIVERS_MAX_K)
+    car_model = IntegerField(required=False)
+    trip_type = IntegerField(required=False)
+
+    def validate(self, attrs):
+        trip_id = attrs.get("trip")
+        if trip_id is not None:
+            trips = Trip.objects.filter(id=trip_id, from_lat__isnull=False)
+            user = self.context["request"].user
+            if not user.is_staff:
+                # another passenger's trip is reported as missing
+                trips = trips.filter(passenger__user=user)
+            trip = trips.values("from_lat", "from_lng", "trip_type_id").first()
+            if not trip:
+                raise NotFound("Trip not found")
+            attrs["lat"], attrs["lng"] = trip["from_lat"], trip["from_lng"]
+            attrs.setdefault("trip_type", trip["trip_type_id"])
+        elif attrs.get("lat") is None or attrs.get("lng") is None:
+            raise ValidationError("trip or lat and lng is required")
+        return attrs
+
+
+class TripQuoteSerializer(Serializer):
+    from_lat = FloatField(min_value=-90, max_value=90)
+    from_lng = FloatField(min_value=-180, max_value=180)
+    to_lat = FloatField(min_value=-90, max_value=90)
+    to_lng = FloatField(min_value=-180, max_value=180)
+
+
+class DispatchOfferSerializer(Serializer):
+    trip = IntegerField()
+
+
 class TripSerializer(ModelSerializer):
     class Meta:
         model = Trip
@@ -25,11 +92,14 @@ class TripSerializer(ModelSerializer):
 
     def validate(self, attrs):
         user_id = self.context["request"].user.id
-        passenger = Passenger.objects.filter(user_id=user_id).values("id").first()
-        if not passenger:
+        passenger_id = (
+            Passenger.objects.filter(user_id=user_id).values_list("id", flat=True).first()
+        )
+        if not passenger_id:
             raise NotFound("Passenger not found")
 
-        attrs["passenger_id"] = passenger.get("id")
+        # cached relation with user_id, the post_save signal needs no extra query
+        attrs["passenger"] = Passenger(id=passenger_id, user_id=user_id)
         return attrs
 
     def save(self, **kwargs):
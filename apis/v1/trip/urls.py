@@ -1,7 +1,21 @@
 from rest_framework.urls import path
 from rest_framework.routers import SimpleRouter
 
-from .views import TripTypeView, ReverseGeocodeView, TripView
+from .views import (
+    TripTypeView,
+    TripTypeSyncView,
+    ReverseGeocodeView,
+    AsyncReverseGeocodeView,
+    AsyncBatchReverseGeocodeView,
+    DriverLocationView,
+    NearbyDriversView,
+    TripQuoteView,
+    DriverOfferView,
+    AcceptOfferView,
+    RejectOfferView,
+    TripView,
+    ProviderStatusView,
+)
 
 app_name = "v1_trip"
 router = SimpleRouter()
@@ -9,5 +23,23 @@ router.register("trips", TripView, basename="trips")
 
 urlpatterns = [
     path("trip_type", TripTypeView.as_view(), name="trip_type"),
+    path("trip_type/sync", TripTypeSyncView.as_view(), name="trip_type_sync"),
     path("reverse_geocode", ReverseGeocodeView.as_view(), name="reverse_geocode"),
+    path(
+        "async/reverse_geocode",
+        AsyncReverseGeocodeView.as_view(),
+        name="async_reverse_geocode",
+    ),
+    path(
+        "async/reverse_geocode/batch",
+        AsyncBatchReverseGeocodeView.as_view(),
+        name="async_batch_reverse_geocode",
+    ),
+    path("driver/location", DriverLocationView.as_view(), name="driver_location"),
+    path("nearby_drivers", NearbyDriversView.as_view(), name="nearby_drivers"),
+    path("quote", TripQuoteView.as_view(), name="quote"),
+    path("driver/offer", DriverOfferView.as_view(), name="driver_offer"),
+    path("driver/offer/accept", AcceptOfferView.as_view(), name="accept_offer"),
+    path("driver/offer/reject", RejectOfferView.as_view(), name="reject_offer"),
+    path("provider_status", ProviderStatusView.as_view(), name="provider_status"),
 ] + router.urls
@@ -1,31 +1,79 @@
-from rest_framework.permissions import IsAuthenticated
+from adrf.views import APIView as AsyncAPIView
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from django.core.cache import cache
+from rest_framework.generics import GenericAPIView
 from rest_framework.viewsets import ModelViewSet
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 
+from apis.utils.custom_exceptions import NotDriverException
+from apps.auth_app.services.notifications import buffered_notifications
 from apps.trip_app.models import TripType, Trip
-from base.utils.neshan import reverse_geocode
-from .serializer import TripTypeSerializer, ReverseGeocodeSerializer, TripSerializer
+from apps.trip_app.tasks import dispatch_trip_celery
+from apps.trip_app.services.dispatch import (
+    get_driver_offer,
+    accept_offer,
+    reject_offer,
+)
+from apps.trip_app.services.locations import (
+    get_driver_id,
+    a_get_driver_id,
+    a_ingest_pings,
+)
+from apps.trip_app.services.nearby import nearby_drivers, get_trip_type_car_models
+from apps.trip_app.services.pricing import quote_trip
+from base.utils.circuit_breaker import breakers_snapshot
+from base.utils.tiered_cache import tiered_cache_stats
+from base.utils.neshan import (
+    cached_reverse_geocode,
+    a_cached_reverse_geocode,
+    a_batch_reverse_geocode,
+    reverse_geocode_cache_stats,
+    distance_matrix_cache_stats,
+)
+from .serializer import (
+    TripTypeSerializer,
+    ReverseGeocodeSerializer,
+    BatchReverseGeocodeSerializer,
+    DriverLocationSerializer,
+    NearbyDriversSerializer,
+    TripQuoteSerializer,
+    DispatchOfferSerializer,
+    TripSerializer,
+)
+from ...utils.cached_views import CachedResponseMixin
 from ...utils.custom_response import response
-from ...utils.paginations import CustomPagination
+from ...utils.delta_sync import DeltaSyncMixin
+from ...utils.paginations import KeysetPagination
 
 
-class TripTypeView(APIView):
+class TripTypeView(CachedResponseMixin, APIView):
     serializer_class = TripTypeSerializer
+    # invalidated by the TripType signals
+    cache_namespace = "trip_type"
 
-    def get(self, request):
+    def list_trip_types(self):
         queryset = TripType.objects.filter(is_active=True).only("trip_name")
         serializer = self.serializer_class(queryset, many=True)
+        return response(
+            success=True, result=serializer.data, error=False, status_code=200
+        )
+
+    def get(self, request):
+        return self.cached_response(request, self.list_trip_types)
+
+
+class TripTypeSyncView(DeltaSyncMixin, GenericAPIView):
+    """
+    تغییرات نوع سفرها از watermark قبلی (?since=)
+    """
+
+    serializer_class = TripTypeSerializer
 
-        # check in cache
-        res = cache.get("trip_type")
-        if res:
-            return response(success=True, result=res, error=False, status_code=200)
-        else:
-            cache.set("trip_type", serializer.data)
-            return response(
-                success=True, result=serializer.data, error=False, status_code=200
-            )
+    def get_sync_queryset(self):
+        return TripType.objects.only("trip_name", "is_active", "updated_at")
+
+    def get(self, request):
+        return self.sync_response(request)
 
 
 class ReverseGeocodeView(APIView):
@@ -38,12 +86,194 @@ class ReverseGeocodeView(APIView):
 
         # request into api
         lat, lng = serializer.validated_data["lat"], serializer.validated_data["lng"]
-        result = reverse_geocode(lat, lng)
+        result = cached_reverse_geocode(lat, lng)
+
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class AsyncReverseGeocodeView(AsyncAPIView):
+    """
+    نسخه async تبدیل مختصات به ادرس، برای اجرا روی asgi (base/asgi.py)
+    """
+
+    serializer_class = ReverseGeocodeSerializer
+    permission_classes = (IsAuthenticated,)
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        lat, lng = serializer.validated_data["lat"], serializer.validated_data["lng"]
+        result = await a_cached_reverse_geocode(lat, lng)
+
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class AsyncBatchReverseGeocodeView(AsyncAPIView):
+    """
+    تبدیل دسته‌ای مختصات به ادرس (حداکثر 50 نقطه) \n
+    points --> [{"lat": 35.7, "lng": 51.4}, ...] \n
+    خروجی به ترتیب ورودی و برای هر نقطه result و error جدا دارد
+    """
+
+    serializer_class = BatchReverseGeocodeSerializer
+    permission_classes = (IsAuthenticated,)
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        points = [
+            (point["lat"], point["lng"])
+            for point in serializer.validated_data["points"]
+        ]
+        result = await a_batch_reverse_geocode(points)
+
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class DriverLocationView(AsyncAPIView):
+    """
+    ارسال موقعیت زنده راننده، چند موقعیت در یک درخواست \n
+    pings --> [{"lat": 35.7, "lng": 51.4, "ts": 1760000000}, ...]
+    """
+
+    serializer_class = DriverLocationSerializer
+    # user id from the token itself, no user query on the hot path
+    authentication_classes = (JWTStatelessUserAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    async def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        driver_id = await a_get_driver_id(request.user.id)
+        if driver_id is None:
+            raise NotDriverException()
+
+        result = await a_ingest_pings(driver_id, serializer.validated_data["pings"])
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class NearbyDriversView(APIView):
+    """
+    نزدیک‌ترین راننده‌های آزاد و تایید شده \n
+    ?trip=12 یا ?lat=35.7&lng=51.4 \n
+    فیلترها: radius_km, k, car_model, trip_type
+    """
+
+    serializer_class = NearbyDriversSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        serializer = self.serializer_class(
+            data=request.query_params, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        car_model_ids = None
+        if data.get("trip_type"):
+            car_model_ids = get_trip_type_car_models(data["trip_type"])
+        if data.get("car_model"):
+            car_model_ids = {data["car_model"]} & (car_model_ids or {data["car_model"]})
+
+        result = nearby_drivers(
+            data["lat"],
+            data["lng"],
+            radius_km=data["radius_km"],
+            k=data["k"],
+            car_model_ids=car_model_ids,
+        )
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class TripQuoteView(APIView):
+    """
+    پیش نمایش قیمت سفر برای همه نوع سفرها \n
+    ?from_lat=35.7&from_lng=51.4&to_lat=35.75&to_lng=51.45
+    """
+
+    serializer_class = TripQuoteSerializer
+    permission_classes = (IsAuthenticated,)
 
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        result = quote_trip(**serializer.validated_data)
         return response(success=True, result=result, error=False, status_code=200)
 
 
-class TripView(ModelViewSet):
+class DriverOfferView(APIView):
+    """
+    سفری که الان به راننده پیشنهاد شده (با expires_in ثانیه) \n
+    result=null یعنی پیشنهادی ندارد
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get_driver_id(self):
+        driver_id = get_driver_id(self.request.user.id)
+        if driver_id is None:
+            raise NotDriverException()
+        return driver_id
+
+    def get(self, request):
+        result = get_driver_offer(self.get_driver_id())
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class AcceptOfferView(DriverOfferView):
+    """
+    پذیرش سفر پیشنهاد شده، فقط اولین راننده موفق می‌شود (409 برای بقیه)
+    """
+
+    serializer_class = DispatchOfferSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        trip_id = serializer.validated_data["trip"]
+        reservation = accept_offer(self.get_driver_id(), trip_id)
+        result = {"trip": trip_id, "reservation": reservation.id}
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class RejectOfferView(DriverOfferView):
+    serializer_class = DispatchOfferSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        trip_id = serializer.validated_data["trip"]
+        if reject_offer(self.get_driver_id(), trip_id):
+            # whole wave rejected, do not wait for the offer timeout
+            dispatch_trip_celery.delay(trip_id=trip_id)
+        return response(success=True, result=None, error=False, status_code=200)
+
+
+class ProviderStatusView(APIView):
+    """
+    وضعیت سرویس‌های خارجی (نشان) برای مانیتورینگ
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        result = {
+            "reverse_geocode_cache": reverse_geocode_cache_stats(),
+            "distance_matrix_cache": distance_matrix_cache_stats(),
+            "circuit_breakers": breakers_snapshot(),
+            "notification_buffer": buffered_notifications(),
+            "tiered_cache": tiered_cache_stats(),
+        }
+        return response(success=True, result=result, error=False, status_code=200)
+
+
+class TripView(DeltaSyncMixin, ModelViewSet):
     """
     status -->     ("pending", "در انتظار"),
     ("confirmed", "تایید شده"),
@@ -51,12 +281,13 @@ class TripView(ModelViewSet):
     ("cancelled", "لغو شده"),
     ("reserve", "رزور سفر"), \n
 
-    trip_type --> رزور سفر
+    trip_type --> رزور سفر \n
+    sync --> تغییرات از watermark قبلی (?since=)
     """
 
     serializer_class = TripSerializer
     permission_classes = (IsAuthenticated,)
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user_id = self.request.user.id
@@ -64,11 +295,15 @@ class TripView(ModelViewSet):
             "-id"
         )
 
+    def get_sync_queryset(self):
+        return Trip.objects.filter(passenger__user_id=self.request.user.id)
+
     def perform_destroy(self, instance):
         instance.is_active = False
-        instance.save()
+        # status is untouched, no notification
+        instance.save(update_fields=("is_active", "updated_at"))
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        context['pk'] = self.kwargs.get('pk')
-        return context
\ No newline at end of file
+        context["pk"] = self.kwargs.get("pk")
+        return context
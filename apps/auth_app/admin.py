@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
@@ -18,6 +19,7 @@ from .models import (
     DriverCar,
 )
 from apps.core_app.models import Image
+from base.utils.paginator import ApproximateCountPaginator
 
 
 class DriverDocumentInline(admin.TabularInline):
@@ -171,11 +173,12 @@ class ImageAdmin(admin.ModelAdmin):
 
     @admin.action(description="disable field")
     def disable_field(self, request, queryset):
-        queryset.update(is_active=False)
+        # .update() skips auto_now, delta sync needs updated_at
+        queryset.update(is_active=False, updated_at=timezone.now())
 
     @admin.action(description="enable field")
     def enable_field(self, request, queryset):
-        queryset.update(is_active=True)
+        queryset.update(is_active=True, updated_at=timezone.now())
 
 
 @admin.register(Passenger)
@@ -388,6 +391,8 @@ class UserNotificationAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at", "updated_at")
     ordering = ("-id",)
     list_per_page = 25
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     actions = ("disable_field", "enable_field")
     list_display_links = ("id", "user_id", "get_user_phone")
 
@@ -411,11 +416,12 @@ class UserNotificationAdmin(admin.ModelAdmin):
 
     @admin.action(description="disable field")
     def disable_field(self, request, queryset):
-        queryset.update(is_active=False)
+        # .update() skips auto_now, delta sync needs updated_at
+        queryset.update(is_active=False, updated_at=timezone.now())
 
     @admin.action(description="enable field")
     def enable_field(self, request, queryset):
-        queryset.update(is_active=True)
+        queryset.update(is_active=True, updated_at=timezone.now())
 
 
 @admin.register(CarBrand)
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0005_alter_user_username"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="usernotification",
+            index=models.Index(
+                fields=["user", "-id"], name="user_notification_user_id"
+            ),
+        ),
+    ]
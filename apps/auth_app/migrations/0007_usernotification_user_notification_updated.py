@@ -0,0 +1,19 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0006_usernotification_user_notification_user_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="usernotification",
+            index=models.Index(
+                fields=["user", "updated_at", "id"], name="user_notification_updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0007_usernotification_user_notification_updated"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="usernotification",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                editable=False,
+                verbose_name="تاریخ ایجاد فیلد",
+            ),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db import models
 
@@ -12,6 +13,7 @@ class User(AbstractUser):
     """
     کاربر
     """
+
     username_validator = UnicodeUsernameValidator()
 
     phone = models.CharField(_("شماره تلفن"), max_length=15, unique=True)
@@ -36,6 +38,18 @@ class User(AbstractUser):
     USERNAME_FIELD = "phone"
     REQUIRED_FIELDS = ("email", "username", "is_developer")
 
+    # is_driver as loaded from the database, driver meta follows it (trip_app/signal.py)
+    _loaded_is_driver = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # deferred is_driver --> unknown, treated as changed
+        instance._loaded_is_driver = instance.__dict__.get(
+            "is_driver", models.DEFERRED
+        )
+        return instance
+
     def clean(self):
         # چک برای هر دو حالت ایجاد و ویرایش
         if self.email:
@@ -211,7 +225,19 @@ class UserNotification(ModifyMixin, ActiveMixin):
     )
     title = models.CharField(_("عنوان"), max_length=200)
     body = models.TextField(_("متن"))
+    # not auto_now_add, the buffered flush keeps the time of the push
+    created_at = models.DateTimeField(
+        _("تاریخ ایجاد فیلد"), default=timezone.now, editable=False
+    )
 
     class Meta:
         ordering = ("id",)
         db_table = "auth_user_notification"
+        indexes = (
+            # keyset pagination of a user's notifications
+            models.Index(fields=("user", "-id"), name="user_notification_user_id"),
+            # delta sync of a user's notifications
+            models.Index(
+                fields=("user", "updated_at", "id"), name="user_notification_updated"
+            ),
+        )
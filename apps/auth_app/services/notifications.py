@@ -0,0 +1,143 @@
+import datetime
+import logging
+import time
+
+import msgpack
+from celery import current_app
+from decouple import config
+from django.db import DataError, IntegrityError, transaction
+from redis.exceptions import LockError, ResponseError
+
+from apps.auth_app.models import UserNotification
+from base.utils.redis_conn import get_redis
+
+NOTIFICATION_BUFFER_KEY = "notifications:buffer"  # list, msgpack payloads
+NOTIFICATION_PROCESSING_KEY = "notifications:buffer:processing"
+NOTIFICATION_FLUSH_LOCK_KEY = "notifications:flush:lock"
+NOTIFICATION_FLUSH_SCHEDULED_KEY = "notifications:flush:scheduled"
+NOTIFICATION_DEAD_KEY = "notifications:dead"  # list, payloads that can not be stored
+
+NOTIFICATION_FLUSH_SIZE = config(
+    "NOTIFICATION_FLUSH_SIZE", cast=int, default=500
+)  # buffered notifications that trigger a flush right away
+NOTIFICATION_FLUSH_INTERVAL = config(
+    "NOTIFICATION_FLUSH_INTERVAL", cast=int, default=5
+)  # seconds, the oldest notification waits at most this long
+NOTIFICATION_FLUSH_CHUNK = 1000  # rows per bulk insert
+NOTIFICATION_FLUSH_LOCK_TIMEOUT = 60
+
+
+def push_notification(user_id, title, body):
+    """
+    نوتیفیکیشن در بافر redis قرار می‌گیرد و دسته‌ای در دیتابیس ذخیره می‌شود (flush_notifications)
+    بدون رفت و برگشت به broker، flush با beat (سن) یا پر شدن بافر (اندازه) انجام می‌شود
+    """
+    redis = get_redis()
+    payload = msgpack.packb(
+        {"user_id": user_id, "title": title, "body": body, "ts": time.time()}
+    )
+    size = redis.rpush(NOTIFICATION_BUFFER_KEY, payload)
+    if size < NOTIFICATION_FLUSH_SIZE:
+        return
+    # one flush request per interval, not one per push
+    if redis.set(
+        NOTIFICATION_FLUSH_SCHEDULED_KEY, 1, nx=True, ex=NOTIFICATION_FLUSH_INTERVAL
+    ):
+        current_app.send_task("apps.auth_app.tasks.flush_notifications_celery")
+
+
+def _unpack(payload):
+    data = msgpack.unpackb(payload)
+    return UserNotification(
+        user_id=data["user_id"],
+        title=data["title"],
+        body=data["body"],
+        # the time of the push, not of the flush
+        created_at=datetime.datetime.fromtimestamp(data["ts"], datetime.UTC),
+    )
+
+
+def _insert(redis, payloads):
+    """
+    یک bulk_create برای کل chunk، اگر ردیفی خراب باشد ردیف به ردیف
+    و payloadهای خراب به dead letter منتقل می‌شوند تا بقیه گیر نکنند
+    """
+    notifications, dead = [], []
+    for payload in payloads:
+        try:
+            notifications.append((payload, _unpack(payload)))
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException):
+            dead.append(payload)
+
+    written = 0
+    try:
+        with transaction.atomic():
+            UserNotification.objects.bulk_create([row for _, row in notifications])
+        written = len(notifications)
+    except (IntegrityError, DataError):
+        for payload, row in notifications:
+            try:
+                with transaction.atomic():
+                    row.save(force_insert=True)
+                written += 1
+            except (IntegrityError, DataError):
+                dead.append(payload)
+
+    if dead:
+        logging.error("%s notifications moved to the dead letter list", len(dead))
+        redis.rpush(NOTIFICATION_DEAD_KEY, *dead)
+    return written
+
+
+def _flush_processing(redis, lock, chunk_size):
+    written = 0
+    while True:
+        # raises if the lock expired and another worker may own the list now
+        lock.reacquire()
+        payloads = redis.lrange(NOTIFICATION_PROCESSING_KEY, 0, chunk_size - 1)
+        if not payloads:
+            return written
+        written += _insert(redis, payloads)
+        # a worker that took over the list would lose rows to this trim
+        lock.reacquire()
+        # removed only after the insert, a crash here means a duplicate, not a loss
+        redis.ltrim(NOTIFICATION_PROCESSING_KEY, len(payloads), -1)
+
+
+def flush_notifications(chunk_size=NOTIFICATION_FLUSH_CHUNK):
+    """
+    تخلیه بافر نوتیفیکیشن با bulk_create، حداقل یکبار (at-least-once)
+    اگر flush قبلی نیمه کاره مانده باشد اول همان ادامه داده می‌شود
+    قفل توکن دار است و با هر chunk تمدید می‌شود
+    """
+    redis = get_redis()
+    lock = redis.lock(
+        NOTIFICATION_FLUSH_LOCK_KEY, timeout=NOTIFICATION_FLUSH_LOCK_TIMEOUT
+    )
+    if not lock.acquire(blocking=False):
+        # another worker is flushing
+        return 0
+    try:
+        written = _flush_processing(redis, lock, chunk_size)
+        try:
+            redis.rename(NOTIFICATION_BUFFER_KEY, NOTIFICATION_PROCESSING_KEY)
+        except ResponseError:
+            # buffer is empty
+            return written
+        return written + _flush_processing(redis, lock, chunk_size)
+    finally:
+        try:
+            # compare-and-delete, never the lock of another worker
+            lock.release()
+        except LockError:
+            logging.warning("notification flush lock expired before release")
+
+
+def buffered_notifications():
+    redis = get_redis()
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.llen(NOTIFICATION_BUFFER_KEY)
+        pipe.llen(NOTIFICATION_PROCESSING_KEY)
+        pipe.llen(NOTIFICATION_DEAD_KEY)
+        buffered, processing, dead = pipe.execute()
+    return {"buffered": buffered, "processing": processing, "dead": dead}
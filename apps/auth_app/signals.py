@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch.dispatcher import receiver
-from .models import User, Passenger, Driver
+from .models import User, Passenger, Driver, CarBrand, CarModel
+from base.utils.tiered_cache import get_tiered_cache
 
 
 @receiver(post_save, sender=User)
@@ -9,3 +11,17 @@ def create_passenger_or_driver(sender, instance, created, **kwargs):
         passenger, _ = Passenger.objects.get_or_create(user=instance)
     if instance.is_driver:
         driver, _ = Driver.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=CarBrand)
+@receiver(post_delete, sender=CarBrand)
+def clear_cache_car_brand(sender, **kwargs):
+    transaction.on_commit(get_tiered_cache("car_brand").invalidate)
+    # car models are listed with their brand name
+    transaction.on_commit(get_tiered_cache("car_model").invalidate)
+
+
+@receiver(post_save, sender=CarModel)
+@receiver(post_delete, sender=CarModel)
+def clear_cache_car_model(sender, **kwargs):
+    transaction.on_commit(get_tiered_cache("car_model").invalidate)
@@ -3,7 +3,7 @@ import logging
 
 from celery import shared_task
 from base.utils.send_sms import send_sms_sorna
-from apps.auth_app.models import UserNotification
+from apps.auth_app.services.notifications import push_notification, flush_notifications
 
 
 @shared_task(bind=True, max_retries=2, queue="send_otp")
@@ -17,8 +17,19 @@ def send_otp_sms_celery(self, phone, otp_code):
 
 @shared_task(bind=True, max_retries=2, queue="notifications")
 def create_notification_celery(self, title, body, user_id):
+    # kept for producers that still enqueue, the row is written by the buffer flush
     try:
-        UserNotification.objects.create(title=title, body=body, user_id=user_id)
+        push_notification(user_id, title, body)
     except Exception as e:
         logging.error("failed to create notification", exc_info=e)
         raise self.retry(exc=e, countdown=5)
+
+
+@shared_task(bind=True, max_retries=2, queue="notifications")
+def flush_notifications_celery(self):
+    try:
+        flush_notifications()
+    except Exception as e:
+        # unsaved rows stay in the processing list for the next flush
+        logging.error("failed to flush notifications", exc_info=e)
+        raise self.retry(exc=e, countdown=5)
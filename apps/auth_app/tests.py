@@ -1,3 +1,383 @@
+import datetime
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import msgpack
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import LockError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apis.utils.delta_sync import SYNC_SAFETY_LAG
+from apis.utils.paginations import KeysetPagination
+from apis.v1.auth.views import CarBrandViewSet
+from apps.auth_app.models import CarBrand, User, UserNotification
+from apps.auth_app.services import notifications
+from apps.auth_app.services.notifications import (
+    NOTIFICATION_BUFFER_KEY,
+    NOTIFICATION_DEAD_KEY,
+    NOTIFICATION_FLUSH_LOCK_KEY,
+    NOTIFICATION_FLUSH_SCHEDULED_KEY,
+    NOTIFICATION_PROCESSING_KEY,
+    buffered_notifications,
+    flush_notifications,
+    push_notification,
+)
+from apps.core_app.models import OutboxEvent
+from base.utils.redis_conn import get_redis
+from base.utils.tiered_cache import get_tiered_cache
+
+NOTIFICATION_KEYS = (
+    NOTIFICATION_BUFFER_KEY,
+    NOTIFICATION_PROCESSING_KEY,
+    NOTIFICATION_DEAD_KEY,
+    NOTIFICATION_FLUSH_LOCK_KEY,
+    NOTIFICATION_FLUSH_SCHEDULED_KEY,
+)
+
+
+class FlushNotificationsTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis()
+        self.redis.delete(*NOTIFICATION_KEYS)
+        self.addCleanup(self.redis.delete, *NOTIFICATION_KEYS)
+        self.user = User.objects.create_user(
+            phone="09120000100", username="09120000100", password="password"
+        )
+
+    def push_raw(self, **data):
+        payload = {"user_id": self.user.id, "title": "t", "body": "b", "ts": 0}
+        payload.update(data)
+        self.redis.rpush(NOTIFICATION_BUFFER_KEY, msgpack.packb(payload))
+
+    def test_flush_writes_buffered_notifications_in_order(self):
+        for index in range(5):
+            push_notification(self.user.id, f"title {index}", "body")
+        self.assertEqual(flush_notifications(chunk_size=2), 5)
+        self.assertEqual(
+            list(
+                UserNotification.objects.filter(user=self.user).values_list(
+                    "title", flat=True
+                )
+            ),
+            [f"title {index}" for index in range(5)],
+        )
+        self.assertEqual(
+            buffered_notifications(), {"buffered": 0, "processing": 0, "dead": 0}
+        )
+        # the lock is released
+        self.assertFalse(self.redis.exists(NOTIFICATION_FLUSH_LOCK_KEY))
+
+    def test_created_at_is_the_time_of_the_push(self):
+        pushed_at = time.time() - 120
+        self.push_raw(ts=pushed_at)
+        flush_notifications()
+        notification = UserNotification.objects.get(user=self.user)
+        self.assertAlmostEqual(notification.created_at.timestamp(), pushed_at, 3)
+
+    def test_bad_payloads_go_to_the_dead_letter_list(self):
+        self.push_raw(title="first")
+        self.push_raw(title=None)  # NOT NULL, fails the bulk insert
+        self.redis.rpush(NOTIFICATION_BUFFER_KEY, b"\xc1 not msgpack")
+        self.push_raw(title="last")
+
+        self.assertEqual(flush_notifications(), 2)
+        self.assertEqual(
+            set(
+                UserNotification.objects.filter(user=self.user).values_list(
+                    "title", flat=True
+                )
+            ),
+            {"first", "last"},
+        )
+        self.assertEqual(self.redis.llen(NOTIFICATION_DEAD_KEY), 2)
+        self.assertEqual(self.redis.llen(NOTIFICATION_PROCESSING_KEY), 0)
+
+    def test_flush_skips_while_another_worker_holds_the_lock(self):
+        self.push_raw()
+        self.redis.set(NOTIFICATION_FLUSH_LOCK_KEY, "other-worker")
+        self.assertEqual(flush_notifications(), 0)
+        # the other worker's lock is untouched
+        self.assertEqual(self.redis.get(NOTIFICATION_FLUSH_LOCK_KEY), b"other-worker")
+        self.assertEqual(self.redis.llen(NOTIFICATION_BUFFER_KEY), 1)
+
+    def test_lost_lock_stops_before_trimming(self):
+        self.push_raw(title="first")
+        self.push_raw(title="second")
+        insert = notifications._insert
+
+        def insert_and_lose_lock(redis, payloads):
+            written = insert(redis, payloads)
+            # the lock expired during the insert and another worker took it
+            redis.set(NOTIFICATION_FLUSH_LOCK_KEY, "other-worker")
+            return written
+
+        with mock.patch.object(
+            notifications, "_insert", side_effect=insert_and_lose_lock
+        ):
+            with self.assertRaises(LockError):
+                flush_notifications(chunk_size=1)
+
+        # the chunk stays for the new owner, a duplicate at worst, never a loss
+        self.assertEqual(self.redis.llen(NOTIFICATION_PROCESSING_KEY), 2)
+        self.assertEqual(self.redis.get(NOTIFICATION_FLUSH_LOCK_KEY), b"other-worker")
+
+
+class RequestOtpViewTests(TestCase):
+    url = reverse("v1_auth:request_otp_phone")
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone="09120000101", username="09120000101", password="password"
+        )
+
+    @mock.patch("apis.v1.auth.views.send_otp_sms_celery")
+    def test_otp_is_sent_directly_and_never_stored_in_the_outbox(self, send_otp):
+        response = self.client.post(self.url, {"phone": self.user.phone})
+        self.assertEqual(response.status_code, 200)
+        send_otp.delay.assert_called_once()
+        phone, otp_code = send_otp.delay.call_args.args
+        self.assertEqual(phone, self.user.phone)
+        self.assertTrue(otp_code.isdigit())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class NotificationKeysetPaginationTests(TestCase):
+    url = reverse("v1_auth:user_notification-list")
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone="09120000102", username="09120000102", password="password"
+        )
+        other = User.objects.create_user(
+            phone="09120000103", username="09120000103", password="password"
+        )
+        self.ids = [
+            UserNotification.objects.create(user=self.user, title=f"n{i}", body="b").id
+            for i in range(5)
+        ]
+        UserNotification.objects.create(user=other, title="other", body="b")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["result"]
+
+    def ids_of(self, page):
+        return [row["id"] for row in page["results"]]
+
+    def test_walks_newest_first_without_gaps(self):
+        seen, page = [], self.page(self.url, page_size=2)
+        self.assertIsNone(page["previous"])
+        while True:
+            seen += self.ids_of(page)
+            if page["next"] is None:
+                break
+            page = self.page(page["next"])
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+    def test_previous_returns_the_page_before(self):
+        first = self.page(self.url, page_size=2)
+        second = self.page(first["next"])
+        self.assertEqual(self.ids_of(self.page(second["previous"])), self.ids_of(first))
+
+    def test_new_rows_do_not_shift_the_next_page(self):
+        first = self.page(self.url, page_size=2)
+        UserNotification.objects.create(user=self.user, title="new", body="b")
+        second = self.page(first["next"])
+        self.assertEqual(self.ids_of(second), sorted(self.ids, reverse=True)[2:4])
+
+    def test_tampered_cursor_is_rejected(self):
+        first = self.page(self.url, page_size=2)
+        cursor = parse_qs(urlparse(first["next"]).query)["cursor"][0]
+        response = self.client.get(self.url, {"cursor": cursor[:-2] + "xx"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_ordering_is_rejected(self):
+        request = APIRequestFactory().get(self.url)
+        queryset = UserNotification.objects.order_by("-created_at")
+        with self.assertRaises(AssertionError):
+            KeysetPagination().paginate_queryset(queryset, Request(request))
+
+
+def clear_tiered_cache(redis, tiered_cache):
+    keys = list(redis.scan_iter(f"*tiered_cache*{tiered_cache.namespace}*"))
+    if keys:
+        redis.delete(*keys)
+    tiered_cache.clear_local()
+
+
+class CatalogConditionalGetTests(TestCase):
+    url = reverse("v1_auth:car_brand-list")
+
+    def setUp(self):
+        self.redis = get_redis()
+        self.tiered_cache = get_tiered_cache("car_brand")
+        self.clear_cache()
+        self.addCleanup(self.clear_cache)
+
+        CarBrand.objects.create(brand_name="پژو")
+        self.user = User.objects.create_user(
+            phone="09120000104", username="09120000104", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def clear_cache(self):
+        clear_tiered_cache(self.redis, self.tiered_cache)
+
+    def test_matching_etag_gets_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"].startswith("W/"))
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_write_changes_the_etag(self):
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            CarBrand.objects.create(brand_name="تویوتا")
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertIn("تویوتا", second.content.decode())
+
+    def test_etag_does_not_repeat_after_redis_loses_the_version(self):
+        etags = set()
+        for _ in range(3):
+            etags.add(self.client.get(self.url)["ETag"])
+            with self.captureOnCommitCallbacks(execute=True):
+                CarBrand.objects.create(brand_name=f"برند {len(etags)}")
+        # flush or eviction, the counter would restart from zero
+        self.clear_cache()
+        for _ in range(3):
+            etag = self.client.get(self.url)["ETag"]
+            self.assertNotIn(etag, etags)
+            etags.add(etag)
+            self.tiered_cache.invalidate()
+
+
+class CatalogDeltaSyncTests(TestCase):
+    url = reverse("v1_auth:car_brand-sync")
+
+    def setUp(self):
+        # rows older than the safety lag, all with the same updated_at
+        self.past = timezone.now() - datetime.timedelta(minutes=5)
+        self.ids = [
+            CarBrand.objects.create(brand_name=f"برند {i}").id for i in range(5)
+        ]
+        CarBrand.objects.update(updated_at=self.past)
+        self.user = User.objects.create_user(
+            phone="09120000105", username="09120000105", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        params = {"since": since} if since else {}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["result"]
+
+    @mock.patch.object(CarBrandViewSet, "sync_page_size", 2)
+    def test_pages_through_equal_timestamps_by_id(self):
+        seen, result = [], self.sync()
+        while True:
+            seen += [row["id"] for row in result["upserted"]]
+            if not result["has_more"]:
+                break
+            result = self.sync(result["watermark"])
+        self.assertEqual(seen, self.ids)
+        # nothing changed since the last watermark
+        self.assertEqual(self.sync(result["watermark"])["upserted"], [])
+
+    def test_reports_changes_and_soft_deletes_after_the_watermark(self):
+        watermark = self.sync()["watermark"]
+        later = self.past + datetime.timedelta(seconds=1)
+        CarBrand.objects.filter(id=self.ids[0]).update(
+            brand_name="تغییر کرده", updated_at=later
+        )
+        CarBrand.objects.filter(id=self.ids[1]).update(
+            is_active=False, updated_at=later
+        )
+
+        result = self.sync(watermark)
+        self.assertEqual([row["id"] for row in result["upserted"]], [self.ids[0]])
+        self.assertEqual(result["deleted"], [self.ids[1]])
+        self.assertFalse(result["has_more"])
+
+    def test_rows_inside_the_safety_lag_wait_for_the_next_sync(self):
+        watermark = self.sync()["watermark"]
+        fresh = CarBrand.objects.create(brand_name="تازه")
+        self.assertEqual(self.sync(watermark)["upserted"], [])
+
+        CarBrand.objects.filter(id=fresh.id).update(
+            updated_at=timezone.now() - datetime.timedelta(seconds=SYNC_SAFETY_LAG + 1)
+        )
+        self.assertEqual(
+            [row["id"] for row in self.sync(watermark)["upserted"]], [fresh.id]
+        )
+
+    def test_tampered_watermark_is_rejected(self):
+        watermark = self.sync()["watermark"]
+        response = self.client.get(self.url, {"since": watermark[:-2] + "xx"})
+        self.assertEqual(response.status_code, 400)
+
+
+class MessagePackNegotiationTests(TestCase):
+    url = reverse("v1_auth:car_brand-list")
+
+    def setUp(self):
+        redis, tiered_cache = get_redis(), get_tiered_cache("car_brand")
+        clear_tiered_cache(redis, tiered_cache)
+        self.addCleanup(clear_tiered_cache, redis, tiered_cache)
+
+        CarBrand.objects.create(brand_name="پژو")
+        self.user = User.objects.create_user(
+            phone="09120000106", username="09120000106", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_same_data_as_json_and_cached_per_format(self):
+        packed = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(packed.status_code, 200)
+        self.assertEqual(packed["Content-Type"], "application/msgpack")
+
+        # the cached msgpack body is never served to a json client
+        plain = self.client.get(self.url, HTTP_ACCEPT="application/json")
+        self.assertTrue(plain["Content-Type"].startswith("application/json"))
+        self.assertEqual(msgpack.unpackb(packed.content), plain.json())
+        self.assertNotEqual(packed["ETag"], plain["ETag"])
+
+    @mock.patch("apis.v1.auth.views.send_otp_sms_celery")
+    def test_msgpack_request_body(self, send_otp):
+        response = APIClient().post(
+            reverse("v1_auth:request_otp_phone"),
+            msgpack.packb({"phone": self.user.phone}),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 200)
+        result = msgpack.unpackb(response.content)["result"]
+        self.assertEqual(result["mobile"], self.user.phone)
+        send_otp.delay.assert_called_once()
 
-# Create your tests here.
+    def test_broken_msgpack_body_is_a_400(self):
+        response = APIClient().post(
+            reverse("v1_auth:request_otp_phone"),
+            b"\xc1",
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+import datetime
+import json
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apis.utils import renderers
+from apis.utils.renderers import ORJSONRenderer
+from apis.v1.auth.serializers import UserNotificationSerializer
+from apis.v1.shop.serializers import RecommenderProductSerializer
+from apps.auth_app.models import UserNotification
+from apps.shop_app.models import Product
+
+
+class _BenchProductSerializer(RecommenderProductSerializer):
+    # the real one reads the prefetched images from the database
+    def get_product_image(self, obj):
+        return f"https://cdn.safiro.ir/images/{obj.id}.webp"
+
+
+def _notifications(size):
+    now = timezone.now()
+    rows = [
+        UserNotification(
+            id=i,
+            title=f"سفر شما تایید شد {i}",
+            body="راننده در راه است، لطفا در مبدا منتظر بمانید",
+            created_at=now - datetime.timedelta(minutes=i),
+            updated_at=now,
+        )
+        for i in range(1, size + 1)
+    ]
+    return UserNotificationSerializer(rows, many=True).data
+
+
+def _products(size):
+    rows = [
+        Product(
+            id=i,
+            category_id=random.randint(1, 20),
+            product_name=f"محصول شماره {i}",
+            product_slug=f"product-{i}",
+            price=Decimal(random.randint(10000, 5000000)) / 100,
+            new_price=Decimal(random.randint(10000, 5000000)) / 100,
+            is_amazing=True,
+        )
+        for i in range(1, size + 1)
+    ]
+    return _BenchProductSerializer(rows, many=True).data
+
+
+def _envelope(results):
+    # same shape as KeysetPagination + response()
+    return {
+        "success": True,
+        "result": {"next": None, "previous": None, "results": results},
+        "error": False,
+    }
+
+
+class Command(BaseCommand):
+    help = "مقایسه زمان رندر JSON با drf و orjson روی لیست محصولات و نوتیفیکیشن‌ها"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson is not installed")
+        random.seed(1)
+        drf_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+        for name, build in (("notifications", _notifications), ("products", _products)):
+            for size in options["sizes"]:
+                data = _envelope(build(size))
+                drf_body = drf_renderer.render(data)
+                orjson_body = orjson_renderer.render(data)
+                if json.loads(drf_body) != json.loads(orjson_body):
+                    raise CommandError(f"{name} bodies differ at {size} rows")
+
+                timings = {}
+                for label, renderer in (
+                    ("drf", drf_renderer),
+                    ("orjson", orjson_renderer),
+                ):
+                    number = max(1, 20000 // size)
+                    best = min(
+                        timeit.repeat(
+                            lambda: renderer.render(data),
+                            repeat=options["repeat"],
+                            number=number,
+                        )
+                    )
+                    timings[label] = best / number * 1000
+                self.stdout.write(
+                    f"{name:>13} {size:>5} rows  drf={timings['drf']:.3f}ms "
+                    f"orjson={timings['orjson']:.3f}ms "
+                    f"speedup={timings['drf'] / timings['orjson']:.1f}x "
+                    f"size={len(orjson_body)}B"
+                )
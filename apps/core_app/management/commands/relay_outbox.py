@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core_app.services.outbox import OUTBOX_BATCH_SIZE, relay_outbox
+
+
+class Command(BaseCommand):
+    help = "ارسال مداوم رویدادهای outbox به celery (چند نمونه همزمان مجاز است)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument(
+            "--idle-sleep",
+            type=float,
+            default=0.2,
+            help="seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="relay one batch and exit"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            sent = relay_outbox(batch_size)
+            if options["once"]:
+                self.stdout.write(f"relayed {sent} events")
+                return
+            # a full batch means more events are probably waiting
+            if sent < batch_size:
+                time.sleep(options["idle_sleep"])
@@ -73,3 +73,16 @@ class MainSettings(ModifyMixin, ActiveMixin):
 
     class Meta:
         db_table = "main_settings"
+
+
+class OutboxEvent(models.Model):
+    """
+    رویدادی که در همان تراکنش ذخیره و بعدا توسط relay به celery فرستاده می‌شود
+    """
+
+    topic = models.CharField(_("موضوع"), max_length=100)
+    payload = models.JSONField(_("داده"), default=dict)
+    created_at = models.DateTimeField(_("تاریخ ایجاد فیلد"), auto_now_add=True)
+
+    class Meta:
+        db_table = "outbox_event"
@@ -0,0 +1,55 @@
+import logging
+
+from celery import current_app
+from decouple import config
+from django.db import transaction
+
+from apps.core_app.models import OutboxEvent
+
+OUTBOX_BATCH_SIZE = config("OUTBOX_BATCH_SIZE", cast=int, default=500)
+
+# topic --> celery task, payload is passed as kwargs
+# payloads stay in postgres until relayed, never put secrets (otp codes) here
+OUTBOX_TOPICS = {
+    "trip.status_changed": "apps.trip_app.tasks.trip_status_changed_celery",
+    "trip.accepted": "apps.trip_app.tasks.trip_accepted_celery",
+}
+
+
+def publish_event(topic, **payload):
+    """
+    در تراکنش جاری نوشته می‌شود، اگر تراکنش rollback شود رویداد هم از بین می‌رود
+    """
+    if topic not in OUTBOX_TOPICS:
+        raise ValueError(f"unknown outbox topic {topic}")
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def relay_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    ارسال رویدادها به celery و حذف دسته‌ای آنها، حداقل یکبار (at-least-once)
+    چند relay همزمان ردیف‌های قفل شده یکدیگر را رد می‌کنند (SKIP LOCKED)
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "topic", "payload")[:batch_size]
+        )
+        done = []
+        for event_id, topic, payload in events:
+            task_name = OUTBOX_TOPICS.get(topic)
+            if task_name is None:
+                logging.error("outbox event %s has unknown topic %s", event_id, topic)
+                done.append(event_id)
+                continue
+            try:
+                current_app.send_task(task_name, kwargs=payload)
+            except Exception as e:
+                # broker is down, the rest is retried on the next run
+                logging.error("failed to relay outbox event %s", event_id, exc_info=e)
+                break
+            done.append(event_id)
+        if done:
+            OutboxEvent.objects.filter(id__in=done).delete()
+    return len(done)
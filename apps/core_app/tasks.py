@@ -0,0 +1,15 @@
+# app/core_app/tasks.py
+import logging
+
+from celery import shared_task
+
+from apps.core_app.services.outbox import relay_outbox
+
+
+@shared_task(bind=True, max_retries=0, queue="outbox")
+def relay_outbox_celery(self):
+    try:
+        relay_outbox()
+    except Exception as e:
+        # the events stay in the table for the next run
+        logging.error("failed to relay outbox", exc_info=e)
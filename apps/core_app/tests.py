@@ -1,3 +1,269 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+import httpx
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from apis.utils import renderers
+from apis.utils.custom_exceptions import (
+    ServiceUnavailableException,
+    UpstreamServerErrorException,
+)
+from apis.utils.parsers import ORJSONParser
+from apis.utils.renderers import ORJSONRenderer
+from apps.core_app.models import OutboxEvent
+from apps.core_app.services.outbox import OUTBOX_TOPICS, publish_event, relay_outbox
+from base.utils import single_flight as single_flight_module
+from base.utils.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    circuit_breaker,
+    get_breaker,
+)
+from base.utils.custom_exceptions import request_error, raise_for_server_error
+from base.utils.single_flight import single_flight, _lock_key, _result_key
+
+
+class SingleFlightTests(SimpleTestCase):
+    key = "tests:single_flight"
+
+    def setUp(self):
+        cache.delete_many([_lock_key(self.key), _result_key(self.key)])
+        self.addCleanup(cache.delete_many, [_lock_key(self.key), _result_key(self.key)])
+
+    def test_leader_computes_once_and_shares_the_result(self):
+        func = mock.Mock(return_value={"distance": 10})
+        self.assertEqual(single_flight(self.key, func, 1, b=2), {"distance": 10})
+        func.assert_called_once_with(1, b=2)
+        self.assertEqual(cache.get(_result_key(self.key)), {"value": {"distance": 10}})
+        self.assertIsNone(cache.get(_lock_key(self.key)))
+
+    def test_follower_rechecks_result_after_the_lock_is_gone(self):
+        # another worker holds the lock and finishes between our two reads
+        cache.set(_lock_key(self.key), 1)
+        real_get = cache.get
+        reads = []
+
+        def get(key, *args, **kwargs):
+            value = real_get(key, *args, **kwargs)
+            if key == _result_key(self.key) and not reads:
+                reads.append(key)
+                cache.set(_result_key(self.key), {"value": "shared"})
+                cache.delete(_lock_key(self.key))
+            return value
+
+        func = mock.Mock(return_value="own")
+        with mock.patch.object(single_flight_module.cache, "get", side_effect=get):
+            result = single_flight(self.key, func)
+
+        self.assertEqual(result, "shared")
+        func.assert_not_called()
+
+    def test_follower_computes_when_leader_left_no_result(self):
+        cache.set(_lock_key(self.key), 1)
+        real_get = cache.get
+
+        def get(key, *args, **kwargs):
+            if key == _lock_key(self.key):
+                # the leader failed and released its lock
+                cache.delete(key)
+            return real_get(key, *args, **kwargs)
+
+        func = mock.Mock(return_value="own")
+        with mock.patch.object(single_flight_module.cache, "get", side_effect=get):
+            self.assertEqual(single_flight(self.key, func), "own")
+        func.assert_called_once_with()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    name = "tests"
+
+    def setUp(self):
+        self.status = 200
+        self.calls = 0
+        client = httpx.Client(
+            base_url="https://upstream.test",
+            transport=httpx.MockTransport(self._handle),
+        )
+        self.addCleanup(client.close)
+
+        @circuit_breaker(self.name)
+        @request_error
+        def call():
+            response = client.get("/")
+            raise_for_server_error(response)
+            return response.json()
+
+        self.call = call
+        self.breaker = get_breaker(self.name)
+        self.breaker.failure_threshold = 2
+        self._clear()
+        self.addCleanup(self._clear)
+
+    def _handle(self, request):
+        self.calls += 1
+        return httpx.Response(self.status, json={"status": self.status})
+
+    def _clear(self):
+        cache.delete_many(
+            [
+                self.breaker._key(suffix)
+                for suffix in ("open", "tripped", "failures", "probe")
+            ]
+        )
+        self.breaker.state(refresh=True)
+
+    def test_client_errors_do_not_count(self):
+        self.status = 404
+        for _ in range(3):
+            self.assertEqual(self.call(), {"status": 404})
+        self.assertEqual(self.breaker.state(refresh=True), CLOSED)
+
+    def test_server_errors_open_the_circuit(self):
+        self.status = 503
+        for _ in range(2):
+            with self.assertRaises(UpstreamServerErrorException):
+                self.call()
+        self.assertEqual(self.breaker.state(refresh=True), OPEN)
+
+        with self.assertRaises(ServiceUnavailableException):
+            self.call()
+        # an open circuit does not reach the upstream
+        self.assertEqual(self.calls, 2)
+
+    def test_failure_window_expiring_before_incr(self):
+        self.status = 502
+        failures_key = self.breaker._key("failures")
+        real_incr = cache.incr
+
+        def incr(key, *args, **kwargs):
+            if key == failures_key:
+                # the key expires right after add saw it
+                cache.delete(key)
+            return real_incr(key, *args, **kwargs)
+
+        cache.set(failures_key, 1, timeout=self.breaker.failure_window)
+        with mock.patch.object(cache, "incr", side_effect=incr):
+            with self.assertRaises(UpstreamServerErrorException):
+                self.call()
+        self.assertEqual(cache.get(failures_key), 1)
+        self.assertEqual(self.breaker.state(refresh=True), CLOSED)
+
+    def test_half_open_trial_call_closes_or_reopens(self):
+        self.status = 500
+        for _ in range(2):
+            with self.assertRaises(UpstreamServerErrorException):
+                self.call()
+        # reset timeout is over, the next request is the trial call
+        cache.delete(self.breaker._key("open"))
+        self.assertEqual(self.breaker.state(refresh=True), HALF_OPEN)
+        with self.assertRaises(UpstreamServerErrorException):
+            self.call()
+        self.assertEqual(self.breaker.state(refresh=True), OPEN)
+
+        cache.delete_many([self.breaker._key("open"), self.breaker._key("probe")])
+        self.breaker.state(refresh=True)
+        self.status = 200
+        self.assertEqual(self.call(), {"status": 200})
+        self.assertEqual(self.breaker.state(refresh=True), CLOSED)
+
+
+@mock.patch("apps.core_app.services.outbox.current_app")
+class RelayOutboxTests(TestCase):
+    def test_relays_in_order_and_deletes_sent_events(self, app):
+        publish_event("trip.accepted", trip_id=1, driver_id=2, user_id=3)
+        publish_event(
+            "trip.status_changed",
+            trip_id=1,
+            user_id=3,
+            status="cancelled",
+            new_trip=False,
+        )
+        self.assertEqual(relay_outbox(), 2)
+        self.assertEqual(
+            app.send_task.call_args_list,
+            [
+                mock.call(
+                    OUTBOX_TOPICS["trip.accepted"],
+                    kwargs={"trip_id": 1, "driver_id": 2, "user_id": 3},
+                ),
+                mock.call(
+                    OUTBOX_TOPICS["trip.status_changed"],
+                    kwargs={
+                        "trip_id": 1,
+                        "user_id": 3,
+                        "status": "cancelled",
+                        "new_trip": False,
+                    },
+                ),
+            ],
+        )
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_broker_failure_keeps_the_rest_for_the_next_run(self, app):
+        for trip_id in range(3):
+            publish_event("trip.accepted", trip_id=trip_id, driver_id=2, user_id=3)
+        app.send_task.side_effect = [None, ConnectionError("broker down")]
+        self.assertEqual(relay_outbox(), 1)
+        self.assertEqual(
+            [event.payload["trip_id"] for event in OutboxEvent.objects.order_by("id")],
+            [1, 2],
+        )
+
+    def test_rolled_back_event_is_never_relayed(self, app):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                publish_event("trip.accepted", trip_id=1, driver_id=2, user_id=3)
+                raise RuntimeError
+        self.assertEqual(relay_outbox(), 0)
+        app.send_task.assert_not_called()
+
+    def test_unknown_topic_is_rejected(self, app):
+        with self.assertRaises(ValueError):
+            publish_event("auth.otp_requested", phone="09120000000", otp_code="1234")
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    data = {
+        "success": True,
+        "result": {
+            "price": Decimal("12500.50"),
+            "created_at": datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.UTC),
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "title": "سفر شما تایید شد",
+            "line": "a b",
+        },
+        "error": False,
+    }
+
+    @skipIf(renderers.orjson is None, "orjson is not installed")
+    def test_same_document_as_drf(self):
+        drf = JSONRenderer().render(self.data)
+        fast = ORJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(fast), json.loads(drf))
+        # still safe to embed in a <script> tag
+        self.assertIn(b"\\u2028", fast)
+
+    def test_falls_back_to_drf_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(
+                ORJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+            )
+
+    def test_parser_round_trip_and_errors(self):
+        body = ORJSONRenderer().render({"phone": "09120000000", "k": [1, 2]})
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)),
+            {"phone": "09120000000", "k": [1, 2]},
+        )
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b"{not json"))
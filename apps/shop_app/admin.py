@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from base.utils.paginator import ApproximateCountPaginator
+
 from .models import (
     Category,
     Product,
@@ -49,6 +51,8 @@ class ProductAdmin(admin.ModelAdmin):
     list_editable = ("is_active", "stock_number", "price", "new_price", "is_amazing")
     list_filter = ("is_active", "created_at", "updated_at", "is_amazing")
     list_per_page = 30
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     search_fields = ("product_name", "id")
     search_help_text = (
         "برای جست و جو میتوانید از نام محصول و شماره ایدی محصول استفاده کنید"
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop_app", "0020_remove_order_is_canceled"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productcomment",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["product", "-id"],
+                name="product_comment_product_id",
+            ),
+        ),
+    ]
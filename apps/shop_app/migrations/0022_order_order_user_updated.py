@@ -0,0 +1,21 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop_app", "0021_productcomment_product_comment_product_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "updated_at", "id"], name="order_user_updated"
+            ),
+        ),
+    ]
@@ -82,6 +82,14 @@ class ProductComment(ModifyMixin, ActiveMixin):
 
     class Meta:
         db_table = "product_comment"
+        indexes = (
+            # keyset pagination of a product's comments
+            models.Index(
+                fields=("product", "-id"),
+                condition=models.Q(is_active=True),
+                name="product_comment_product_id",
+            ),
+        )
 
 
 class Order(ModifyMixin, ActiveMixin):
@@ -96,6 +104,12 @@ class Order(ModifyMixin, ActiveMixin):
 
     class Meta:
         db_table = "order"
+        indexes = (
+            # delta sync of a user's orders
+            models.Index(
+                fields=("user", "updated_at", "id"), name="order_user_updated"
+            ),
+        )
 
 
 class OrderItem(ModifyMixin, ActiveMixin):
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.shop_app.models import Category
+from base.utils.tiered_cache import get_tiered_cache
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def clear_cache_shop_category(sender, **kwargs):
+    transaction.on_commit(get_tiered_cache("shop_category").invalidate)
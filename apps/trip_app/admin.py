@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from base.utils.paginator import ApproximateCountPaginator
+
 from .models import Trip, TripType, TripReservation, TripPrice
 
 
@@ -19,6 +21,8 @@ class TripAdmin(admin.ModelAdmin):
     list_filter = ("status", "is_active", "created_at")
     list_per_page = 30
     list_display_links = ("id", "passenger_id", "passenger_phone")
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
     def passenger_phone(self, obj):
         return obj.passenger.user.phone
@@ -56,6 +60,7 @@ class TripReservationAdmin(admin.ModelAdmin):
 class TripPriceAdmin(admin.ModelAdmin):
     list_display = (
         "id",
+        "trip_type_id",
         "distance_km",
         "price_per_km",
         "traffic_factor",
@@ -63,5 +68,6 @@ class TripPriceAdmin(admin.ModelAdmin):
         "created_at",
         "calc_final_price",
     )
+    list_filter = ("trip_type", "is_active")
     list_per_page = 30
     list_display_links = ("id", "distance_km", "price_per_km")
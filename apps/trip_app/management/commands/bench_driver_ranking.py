@@ -0,0 +1,67 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.trip_app.services import ranking
+from apps.trip_app.services.ranking import rank_candidates
+
+# tehran center
+CENTER_LAT, CENTER_LNG = 35.6997, 51.3380
+
+
+def _features(size):
+    return {
+        "driver_id": list(range(1, size + 1)),
+        "lat": [CENTER_LAT + random.uniform(-0.05, 0.05) for _ in range(size)],
+        "lng": [CENTER_LNG + random.uniform(-0.05, 0.05) for _ in range(size)],
+        "idle_seconds": [random.uniform(0, 3600) for _ in range(size)],
+        "acceptance_rate": [random.random() for _ in range(size)],
+        "car_match": [float(random.random() < 0.5) for _ in range(size)],
+    }
+
+
+class Command(BaseCommand):
+    help = "مقایسه رتبه بندی راننده‌ها با numpy و حلقه پایتون خالص"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if ranking.np is None:
+            raise CommandError("numpy is not installed")
+        random.seed(1)
+        k = options["k"]
+
+        for size in options["sizes"]:
+            features = _features(size)
+            numpy_top = rank_candidates(CENTER_LAT, CENTER_LNG, features, k)
+            python_top = rank_candidates(
+                CENTER_LAT, CENTER_LNG, features, k, use_numpy=False
+            )
+            if [d["driver_id"] for d in numpy_top] != [
+                d["driver_id"] for d in python_top
+            ]:
+                raise CommandError(f"rankings differ at {size} candidates")
+
+            timings = {}
+            for name, use_numpy in (("numpy", True), ("python", False)):
+                # the feature lists are converted to arrays inside, that is part of the cost
+                number = max(1, 20000 // size)
+                best = min(
+                    timeit.repeat(
+                        lambda: rank_candidates(
+                            CENTER_LAT, CENTER_LNG, features, k, use_numpy=use_numpy
+                        ),
+                        repeat=options["repeat"],
+                        number=number,
+                    )
+                )
+                timings[name] = best / number * 1000
+            self.stdout.write(
+                f"{size:>6} candidates  numpy={timings['numpy']:.3f}ms "
+                f"python={timings['python']:.3f}ms "
+                f"speedup={timings['python'] / timings['numpy']:.1f}x"
+            )
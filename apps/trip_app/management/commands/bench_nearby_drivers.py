@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from redis import Redis
+from redis.exceptions import ConnectionError
+
+from apps.trip_app.services.locations import (
+    DRIVER_GEO_KEY,
+    DRIVER_HEARTBEAT_KEY,
+    DRIVER_VERIFIED_KEY,
+    DRIVER_CAR_MODEL_KEY,
+    DRIVER_BUSY_KEY,
+)
+from apps.trip_app.services.nearby import nearby_drivers
+
+# tehran bounding box
+MIN_LAT, MAX_LAT = 35.55, 35.83
+MIN_LNG, MAX_LNG = 51.15, 51.60
+BENCH_KEYS = (
+    DRIVER_GEO_KEY,
+    DRIVER_HEARTBEAT_KEY,
+    DRIVER_VERIFIED_KEY,
+    DRIVER_CAR_MODEL_KEY,
+    DRIVER_BUSY_KEY,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "بنچمارک جستجوی نزدیک‌ترین راننده روی یک دیتابیس جدای redis "
+        "(کلیدهای راننده در آن دیتابیس بازنویسی و در پایان حذف می‌شوند)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--redis-url",
+            default="redis://127.0.0.1:6379/15",
+            help="must not be the production database",
+        )
+        parser.add_argument("--drivers", type=int, default=50000)
+        parser.add_argument("--queries", type=int, default=2000)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--radius-km", type=float, default=3)
+        parser.add_argument("--car-models", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def _seed(self, redis, drivers, car_models):
+        now = time.time()
+        with redis.pipeline(transaction=False) as pipe:
+            for driver_id in range(1, drivers + 1):
+                member = str(driver_id)
+                lat = random.uniform(MIN_LAT, MAX_LAT)
+                lng = random.uniform(MIN_LNG, MAX_LNG)
+                pipe.geoadd(DRIVER_GEO_KEY, (lng, lat, member))
+                pipe.zadd(DRIVER_HEARTBEAT_KEY, {member: now})
+                pipe.hset(DRIVER_CAR_MODEL_KEY, member, random.randint(1, car_models))
+                # ~90% verified, ~30% on a trip
+                if random.random() < 0.9:
+                    pipe.sadd(DRIVER_VERIFIED_KEY, member)
+                if random.random() < 0.3:
+                    pipe.sadd(DRIVER_BUSY_KEY, member)
+                if driver_id % 5000 == 0:
+                    pipe.execute()
+            pipe.execute()
+
+    def _run(self, redis, options, car_model_ids):
+        timings, found = [], []
+        for _ in range(options["queries"]):
+            lat = random.uniform(MIN_LAT, MAX_LAT)
+            lng = random.uniform(MIN_LNG, MAX_LNG)
+            start = time.perf_counter()
+            drivers = nearby_drivers(
+                lat,
+                lng,
+                radius_km=options["radius_km"],
+                k=options["k"],
+                car_model_ids=car_model_ids,
+                redis=redis,
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            found.append(len(drivers))
+        timings.sort()
+        return {
+            "p50": statistics.median(timings),
+            "p95": timings[int(len(timings) * 0.95) - 1],
+            "p99": timings[int(len(timings) * 0.99) - 1],
+            "found": statistics.mean(found),
+        }
+
+    def handle(self, *args, **options):
+        if options["queries"] < 100:
+            raise CommandError("--queries must be at least 100")
+        random.seed(options["seed"])
+        redis = Redis.from_url(options["redis_url"])
+        try:
+            redis.ping()
+        except ConnectionError as e:
+            raise CommandError(f"redis is not reachable: {e}")
+
+        redis.delete(*BENCH_KEYS)
+        try:
+            start = time.perf_counter()
+            self._seed(redis, options["drivers"], options["car_models"])
+            self.stdout.write(
+                f"seeded {options['drivers']} drivers in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+
+            scenarios = (
+                ("any car", None),
+                ("one car model", {1}),
+                ("trip type (5 models)", set(range(1, 6))),
+            )
+            for name, car_model_ids in scenarios:
+                stats = self._run(redis, options, car_model_ids)
+                self.stdout.write(
+                    f"{name:<22} p50={stats['p50']:.2f}ms p95={stats['p95']:.2f}ms "
+                    f"p99={stats['p99']:.2f}ms found={stats['found']:.1f}"
+                )
+        finally:
+            redis.delete(*BENCH_KEYS)
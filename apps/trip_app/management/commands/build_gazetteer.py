@@ -0,0 +1,59 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.utils.gazetteer import GAZETTEER_PATH, build_index, Gazetteer
+
+
+class Command(BaseCommand):
+    help = (
+        "ساخت ایندکس آفلاین تبدیل مختصات به ادرس از فایل csv "
+        "(ستون‌ها: lat, lng, name, city, neighbourhood)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "csv_path", help="gazetteer csv, e.g. converted osm extract"
+        )
+        parser.add_argument("--output", default=GAZETTEER_PATH)
+        parser.add_argument("--delimiter", default=",")
+
+    def handle(self, *args, **options):
+        rows = []
+        skipped = 0
+        try:
+            with open(options["csv_path"], encoding="utf-8", newline="") as f:
+                reader = csv.DictReader(f, delimiter=options["delimiter"])
+                for row in reader:
+                    try:
+                        lat, lng = float(row["lat"]), float(row["lng"])
+                    except (KeyError, TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    name = (row.get("name") or "").strip()
+                    if not name:
+                        skipped += 1
+                        continue
+                    rows.append(
+                        (
+                            lat,
+                            lng,
+                            name,
+                            (row.get("city") or "").strip(),
+                            (row.get("neighbourhood") or "").strip(),
+                        )
+                    )
+        except FileNotFoundError:
+            raise CommandError(f"{options['csv_path']} does not exist")
+
+        if not rows:
+            raise CommandError("no valid rows found")
+
+        count = build_index(rows, options["output"])
+        # sanity check, the written file must be loadable
+        Gazetteer(options["output"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"gazetteer built: {count} points, {skipped} skipped --> {options['output']}"
+            )
+        )
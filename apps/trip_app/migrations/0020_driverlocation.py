@@ -0,0 +1,61 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0005_alter_user_username"),
+        ("trip_app", "0019_alter_trip_from_lat_alter_trip_from_lng_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriverLocation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="تاریخ ایجاد فیلد"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="تاریخ اخرین بروزرسانی فیلد"
+                    ),
+                ),
+                ("lat", models.DecimalField(decimal_places=15, max_digits=17)),
+                ("lng", models.DecimalField(decimal_places=15, max_digits=17)),
+                ("recorded_at", models.DateTimeField(verbose_name="زمان ثبت موقعیت")),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="driver_locations",
+                        to="auth_app.driver",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "driver_location",
+                "indexes": [
+                    models.Index(
+                        fields=["driver", "-recorded_at"],
+                        name="driver_location_recorded",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0005_alter_user_username"),
+        ("trip_app", "0020_driverlocation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="triptype",
+            name="car_models",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="خالی یعنی همه مدل\u200cها",
+                related_name="trip_types",
+                to="auth_app.carmodel",
+                verbose_name="مدل\u200cهای ماشین مجاز",
+            ),
+        ),
+    ]
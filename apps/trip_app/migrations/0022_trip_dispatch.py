@@ -0,0 +1,45 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0005_alter_user_username"),
+        ("trip_app", "0021_triptype_car_models"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="dispatch_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="زمان پایان موج پیشنهاد",
+            ),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="dispatch_wave",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["dispatch_at"],
+                name="trip_pending_dispatch",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tripreservation",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_active", True)),
+                fields=("trip",),
+                name="reservation_active_trip_unique",
+            ),
+        ),
+    ]
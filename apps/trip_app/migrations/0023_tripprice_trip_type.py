@@ -0,0 +1,26 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trip_app", "0022_trip_dispatch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tripprice",
+            name="trip_type",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="prices",
+                to="trip_app.triptype",
+                verbose_name="نوع سفر",
+            ),
+        ),
+    ]
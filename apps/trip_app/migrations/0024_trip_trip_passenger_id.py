@@ -0,0 +1,22 @@
+# Generated by Django 6.0.7 on 2026-10-18 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0006_usernotification_user_notification_user_id"),
+        ("trip_app", "0023_tripprice_trip_type"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["passenger", "-id"],
+                name="trip_passenger_id",
+            ),
+        ),
+    ]
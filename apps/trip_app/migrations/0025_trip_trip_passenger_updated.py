@@ -0,0 +1,20 @@
+# Generated by Django 6.0.7 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth_app", "0007_usernotification_user_notification_updated"),
+        ("trip_app", "0024_trip_trip_passenger_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["passenger", "updated_at", "id"], name="trip_passenger_updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trip_app", "0025_trip_trip_passenger_updated"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tripprice",
+            name="price_per_km",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0.0,
+                max_digits=12,
+                verbose_name="قیمت هر کیلومتر",
+            ),
+        ),
+    ]
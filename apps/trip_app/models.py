@@ -43,8 +43,42 @@ class Trip(ActiveMixin, ModifyMixin):
 
     description = models.TextField(blank=True, null=True)
 
+    # dispatch, offer waves to nearby drivers (services/dispatch.py)
+    dispatch_wave = models.PositiveSmallIntegerField(default=0, editable=False)
+    dispatch_at = models.DateTimeField(
+        _("زمان پایان موج پیشنهاد"), null=True, blank=True, editable=False
+    )
+
+    # status as loaded from the database, None for new trips (signal.py)
+    _loaded_status = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # deferred status --> unknown, treated as changed
+        instance._loaded_status = instance.__dict__.get("status", models.DEFERRED)
+        return instance
+
     class Meta:
         db_table = "trip"
+        indexes = (
+            models.Index(
+                fields=("dispatch_at",),
+                condition=models.Q(status="pending"),
+                name="trip_pending_dispatch",
+            ),
+            # keyset pagination of a passenger's trips
+            models.Index(
+                fields=("passenger", "-id"),
+                condition=models.Q(is_active=True),
+                name="trip_passenger_id",
+            ),
+            # delta sync of a passenger's trips
+            models.Index(
+                fields=("passenger", "updated_at", "id"),
+                name="trip_passenger_updated",
+            ),
+        )
 
 
 class TripReservation(ActiveMixin, ModifyMixin):
@@ -57,6 +91,35 @@ class TripReservation(ActiveMixin, ModifyMixin):
 
     class Meta:
         db_table = "reservation"
+        constraints = (
+            # a trip is never reserved by two drivers
+            models.UniqueConstraint(
+                fields=("trip",),
+                condition=models.Q(is_active=True),
+                name="reservation_active_trip_unique",
+            ),
+        )
+
+
+class DriverLocation(ModifyMixin):
+    """
+    تاریخچه موقعیت راننده (نمونه برداری شده از موقعیت زنده در redis)
+    """
+
+    driver = models.ForeignKey(
+        Driver, on_delete=models.PROTECT, related_name="driver_locations"
+    )
+    lat = models.DecimalField(max_digits=17, decimal_places=15)
+    lng = models.DecimalField(max_digits=17, decimal_places=15)
+    recorded_at = models.DateTimeField(_("زمان ثبت موقعیت"))
+
+    class Meta:
+        db_table = "driver_location"
+        indexes = (
+            models.Index(
+                fields=("driver", "-recorded_at"), name="driver_location_recorded"
+            ),
+        )
 
 
 class TripType(ModifyMixin, ActiveMixin):
@@ -68,12 +131,32 @@ class TripType(ModifyMixin, ActiveMixin):
         blank=True,
         null=True,
     )
+    car_models = models.ManyToManyField(
+        "auth_app.CarModel",
+        related_name="trip_types",
+        blank=True,
+        verbose_name=_("مدل‌های ماشین مجاز"),
+        help_text=_("خالی یعنی همه مدل‌ها"),
+    )
 
     class Meta:
         db_table = "trip_type"
 
 
 class TripPrice(ActiveMixin, ModifyMixin):
+    """
+    distance_km حد پایین بازه مسافت، برای هر سفر ردیف با بزرگترین distance_km کوچکتر از مسافت سفر
+    trip_type خالی یعنی قیمت پیش فرض برای نوع سفرهایی که قیمت جدا ندارند
+    """
+
+    trip_type = models.ForeignKey(
+        TripType,
+        on_delete=models.PROTECT,
+        related_name="prices",
+        blank=True,
+        null=True,
+        verbose_name=_("نوع سفر"),
+    )
     distance_km = models.DecimalField(
         _("فاصله (کیلومتر)"),
         max_digits=10,
@@ -0,0 +1,373 @@
+import datetime
+import logging
+
+from decouple import config
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apis.utils.custom_exceptions import (
+    TripAlreadyTakenException,
+    OfferExpiredException,
+)
+from apps.core_app.services.outbox import publish_event
+from apps.trip_app.models import Trip, TripReservation
+from apps.trip_app.services.locations import DRIVER_BUSY_KEY
+from apps.trip_app.services.notifications import notify_trip_status
+from apps.trip_app.services.nearby import (
+    NEARBY_DRIVERS_MAX_RADIUS_KM,
+    nearby_drivers,
+    get_trip_type_car_models,
+)
+from apps.trip_app.services.ranking import (
+    DRIVER_IDLE_SINCE_KEY,
+    DRIVER_OFFERS_KEY,
+    DRIVER_ACCEPTS_KEY,
+    load_features,
+    rank_candidates,
+)
+from base.utils.redis_conn import get_redis
+
+DISPATCH_WAVE_SIZE = config(
+    "DISPATCH_WAVE_SIZE", cast=int, default=3
+)  # drivers offered the trip at the same time
+DISPATCH_OFFER_TIMEOUT = config(
+    "DISPATCH_OFFER_TIMEOUT", cast=int, default=15
+)  # seconds a driver has to accept
+DISPATCH_MAX_WAVES = config(
+    "DISPATCH_MAX_WAVES", cast=int, default=5
+)  # after that the trip is cancelled
+DISPATCH_RADIUS_KM = config(
+    "DISPATCH_RADIUS_KM", cast=float, default=2
+)  # first wave radius, grows with every wave
+DISPATCH_CANDIDATES = config(
+    "DISPATCH_CANDIDATES", cast=int, default=30
+)  # nearby drivers ranked for every wave
+DISPATCH_SWEEP_BATCH = 500
+# ranked drivers per wave, in waves, spares replace claims lost to a concurrent trip
+DISPATCH_RANKED_WAVES = 2
+
+TRIP_DISPATCH_FIELDS = ("id", "from_lat", "from_lng", "trip_type_id", "dispatch_wave")
+
+# delete the offer only if it still belongs to this trip
+_RELEASE_OFFER_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def driver_offer_key(driver_id):
+    # one open offer per driver, value = trip id
+    return f"dispatch:offer:{driver_id}"
+
+
+def trip_wave_key(trip_id):
+    # drivers of the current wave
+    return f"dispatch:wave:{trip_id}"
+
+
+def trip_offered_key(trip_id):
+    # every driver the trip was offered to, never offered twice
+    return f"dispatch:offered:{trip_id}"
+
+
+def _release_offers(redis, trip_id, driver_ids):
+    release = redis.register_script(_RELEASE_OFFER_SCRIPT)
+    with redis.pipeline(transaction=False) as pipe:
+        for driver_id in driver_ids:
+            release(keys=[driver_offer_key(driver_id)], args=[trip_id], client=pipe)
+        pipe.execute()
+
+
+def _claim_drivers(redis, trip_id, driver_ids):
+    """
+    SET NX روی کلید پیشنهاد هر راننده، در یک burst دو سفر همزمان به یک راننده پیشنهاد نمی‌شوند
+    """
+    claimed = []
+    for start in range(0, len(driver_ids), DISPATCH_WAVE_SIZE):
+        chunk = driver_ids[start : start + DISPATCH_WAVE_SIZE]
+        with redis.pipeline(transaction=False) as pipe:
+            for driver_id in chunk:
+                pipe.set(
+                    driver_offer_key(driver_id),
+                    trip_id,
+                    nx=True,
+                    ex=DISPATCH_OFFER_TIMEOUT,
+                )
+            results = pipe.execute()
+        claimed += [driver_id for driver_id, ok in zip(chunk, results) if ok]
+        if len(claimed) >= DISPATCH_WAVE_SIZE:
+            break
+
+    extra = claimed[DISPATCH_WAVE_SIZE:]
+    if extra:
+        _release_offers(redis, trip_id, extra)
+    return claimed[:DISPATCH_WAVE_SIZE]
+
+
+def _offer_wave(redis, trip, wave):
+    trip_id = trip["id"]
+    wave_key, offered_key = trip_wave_key(trip_id), trip_offered_key(trip_id)
+
+    # drivers of the previous wave that did not answer
+    previous = [int(driver_id) for driver_id in redis.smembers(wave_key)]
+    if previous:
+        _release_offers(redis, trip_id, previous)
+
+    car_model_ids = None
+    if trip["trip_type_id"]:
+        car_model_ids = get_trip_type_car_models(trip["trip_type_id"])
+    candidates = nearby_drivers(
+        trip["from_lat"],
+        trip["from_lng"],
+        radius_km=min(DISPATCH_RADIUS_KM * wave, NEARBY_DRIVERS_MAX_RADIUS_KM),
+        k=DISPATCH_CANDIDATES,
+        car_model_ids=car_model_ids,
+        redis=redis,
+    )
+    offered = {int(driver_id) for driver_id in redis.smembers(offered_key)}
+    candidates = [driver for driver in candidates if driver["driver_id"] not in offered]
+    ranked = rank_candidates(
+        trip["from_lat"],
+        trip["from_lng"],
+        load_features(redis, candidates, car_model_ids),
+        k=DISPATCH_WAVE_SIZE * DISPATCH_RANKED_WAVES,
+    )
+    claimed = _claim_drivers(redis, trip_id, [d["driver_id"] for d in ranked])
+
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(wave_key)
+        if claimed:
+            pipe.sadd(wave_key, *claimed)
+            pipe.sadd(offered_key, *claimed)
+            for driver_id in claimed:
+                pipe.hincrby(DRIVER_OFFERS_KEY, driver_id, 1)
+        # keys outlive every possible wave of the trip
+        keys_timeout = DISPATCH_OFFER_TIMEOUT * (DISPATCH_MAX_WAVES + 1)
+        pipe.expire(wave_key, keys_timeout)
+        pipe.expire(offered_key, keys_timeout)
+        pipe.execute()
+    return claimed
+
+
+def _cancel_trip(trip_id):
+    updated = Trip.objects.filter(id=trip_id, status="pending").update(
+        status="cancelled", dispatch_at=None, updated_at=timezone.now()
+    )
+    if not updated:
+        return
+    user_id = (
+        Trip.objects.filter(id=trip_id)
+        .values_list("passenger__user_id", flat=True)
+        .first()
+    )
+    # .update() does not send post_save
+    publish_event(
+        "trip.status_changed",
+        trip_id=trip_id,
+        user_id=user_id,
+        status="cancelled",
+        new_trip=False,
+    )
+
+
+def _dispatch_locked(redis, trip, now):
+    """
+    trip باید با select_for_update قفل شده باشد
+    """
+    wave = trip["dispatch_wave"] + 1
+    if wave > DISPATCH_MAX_WAVES:
+        logging.info("trip %s cancelled, no driver accepted", trip["id"])
+        _cancel_trip(trip["id"])
+        return None
+
+    claimed = _offer_wave(redis, trip, wave)
+    Trip.objects.filter(id=trip["id"]).update(
+        dispatch_wave=wave,
+        dispatch_at=now + datetime.timedelta(seconds=DISPATCH_OFFER_TIMEOUT),
+        updated_at=now,
+    )
+    return claimed
+
+
+def _dispatchable_trips():
+    return Trip.objects.filter(status="pending", is_active=True, from_lat__isnull=False)
+
+
+def _due(now):
+    # offer wave is over, or the trip was never dispatched (lost event)
+    missed = now - datetime.timedelta(seconds=DISPATCH_OFFER_TIMEOUT)
+    return Q(dispatch_at__lte=now) | Q(dispatch_at__isnull=True, created_at__lte=missed)
+
+
+def dispatch_trip(trip_id, only_due=False):
+    """
+    موج بعدی پیشنهاد سفر به نزدیک‌ترین راننده‌ها
+    اگر سفر در حال dispatch توسط ورکر دیگری باشد (قفل ردیف) رد می‌شود
+    only_due --> فقط اگر هنوز موعد موج بعدی باشد (sweep)
+    خروجی: راننده‌هایی که پیشنهاد گرفتند، None اگر موجی ساخته نشد (رد یا لغو سفر)
+    """
+    redis = get_redis()
+    with transaction.atomic():
+        now = timezone.now()
+        trips = _dispatchable_trips().filter(id=trip_id)
+        if only_due:
+            trips = trips.filter(_due(now))
+        trip = (
+            trips.select_for_update(skip_locked=True)
+            .values(*TRIP_DISPATCH_FIELDS)
+            .first()
+        )
+        if trip is None:
+            return None
+        return _dispatch_locked(redis, trip, now)
+
+
+def sweep_dispatch(batch_size=DISPATCH_SWEEP_BATCH):
+    """
+    سفرهایی که موج پیشنهادشان تمام شده (یا هیچوقت dispatch نشده‌اند) دوباره dispatch می‌شوند
+    هر سفر در تراکنش کوتاه خودش قفل و commit می‌شود، قفل‌ها تا آخر batch نگه داشته نمی‌شوند
+    """
+    trip_ids = list(
+        _dispatchable_trips()
+        .filter(_due(timezone.now()))
+        .order_by("dispatch_at")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    dispatched = 0
+    for trip_id in trip_ids:
+        try:
+            # locked by another worker or already handled --> None
+            claimed = dispatch_trip(trip_id, only_due=True)
+        except Exception as e:
+            logging.warning("failed to dispatch trip %s", trip_id, exc_info=e)
+            continue
+        if claimed is not None:
+            dispatched += 1
+    return dispatched
+
+
+def get_driver_offer(driver_id):
+    """
+    سفری که الان به راننده پیشنهاد شده، None اگر پیشنهادی ندارد
+    """
+    redis = get_redis()
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.get(driver_offer_key(driver_id))
+        pipe.ttl(driver_offer_key(driver_id))
+        trip_id, ttl = pipe.execute()
+    if trip_id is None:
+        return None
+    trip = (
+        Trip.objects.filter(id=int(trip_id), status="pending")
+        .values(
+            "id",
+            "trip_type_id",
+            "from_lat",
+            "from_lng",
+            "from_address",
+            "to_lat",
+            "to_lng",
+            "to_address",
+        )
+        .first()
+    )
+    if trip is None:
+        return None
+    trip["expires_in"] = max(ttl, 0)
+    return trip
+
+
+def accept_offer(driver_id, trip_id):
+    """
+    فقط یک راننده برنده می‌شود: UPDATE شرطی روی status=pending بدون قفل جدول
+    """
+    redis = get_redis()
+    offer = redis.get(driver_offer_key(driver_id))
+    if offer is None or int(offer) != trip_id:
+        raise OfferExpiredException()
+
+    with transaction.atomic():
+        updated = Trip.objects.filter(
+            id=trip_id, status="pending", is_active=True
+        ).update(status="confirmed", dispatch_at=None, updated_at=timezone.now())
+        if not updated:
+            raise TripAlreadyTakenException()
+        reservation = TripReservation.objects.create(
+            trip_id=trip_id, driver_id=driver_id
+        )
+        user_id = (
+            Trip.objects.filter(id=trip_id)
+            .values_list("passenger__user_id", flat=True)
+            .first()
+        )
+
+        # .update() does not send post_save
+        publish_event(
+            "trip.accepted", trip_id=trip_id, driver_id=driver_id, user_id=user_id
+        )
+    return reservation
+
+
+def after_accept(trip_id, driver_id, user_id):
+    """
+    بعد از commit پذیرش (از طریق outbox): راننده مشغول و پیشنهادهای دیگر موج آزاد می‌شوند
+    """
+    redis = get_redis()
+    wave = [int(member) for member in redis.smembers(trip_wave_key(trip_id))]
+    with redis.pipeline(transaction=False) as pipe:
+        # busy before the offer is released, no other trip can claim the driver
+        pipe.sadd(DRIVER_BUSY_KEY, driver_id)
+        pipe.hincrby(DRIVER_ACCEPTS_KEY, driver_id, 1)
+        pipe.hdel(DRIVER_IDLE_SINCE_KEY, driver_id)
+        pipe.execute()
+    _release_offers(redis, trip_id, set(wave) | {driver_id})
+    redis.delete(trip_wave_key(trip_id), trip_offered_key(trip_id))
+    notify_trip_status(user_id, "confirmed")
+
+
+def after_status_change(trip_id, user_id, status, new_trip):
+    """
+    بعد از commit تغییر وضعیت سفر (از طریق outbox)
+    """
+    notify_trip_status(user_id, status)
+    if new_trip:
+        dispatch_trip(trip_id)
+    elif status in ("completed", "cancelled"):
+        release_driver(trip_id)
+        get_redis().delete(trip_wave_key(trip_id), trip_offered_key(trip_id))
+
+
+def reject_offer(driver_id, trip_id):
+    """
+    :return: True اگر همه راننده‌های موج رد کرده باشند و موج بعدی باید زودتر شروع شود
+    """
+    redis = get_redis()
+    _release_offers(redis, trip_id, [driver_id])
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.srem(trip_wave_key(trip_id), driver_id)
+        pipe.scard(trip_wave_key(trip_id))
+        removed, remaining = pipe.execute()
+    return bool(removed) and remaining == 0
+
+
+def release_driver(trip_id):
+    """
+    بعد از پایان یا لغو سفر، راننده دوباره در جستجو قرار می‌گیرد
+    """
+    driver_ids = list(
+        TripReservation.objects.filter(trip_id=trip_id, is_active=True).values_list(
+            "driver_id", flat=True
+        )
+    )
+    if driver_ids:
+        now = timezone.now().timestamp()
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.srem(DRIVER_BUSY_KEY, *driver_ids)
+            pipe.hset(
+                DRIVER_IDLE_SINCE_KEY,
+                mapping={driver_id: now for driver_id in driver_ids},
+            )
+            pipe.execute()
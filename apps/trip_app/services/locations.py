@@ -0,0 +1,196 @@
+import datetime
+import time
+
+from decouple import config
+from django.core.cache import cache
+from redis.exceptions import ResponseError
+
+from apps.auth_app.enums import VerificationStatus
+from apps.auth_app.models import Driver, DriverCar
+from apps.trip_app.models import DriverLocation
+from base.utils.redis_conn import get_redis, get_async_redis
+
+DRIVER_GEO_KEY = "drivers:geo"  # GEO set, member = driver id
+DRIVER_HEARTBEAT_KEY = "drivers:heartbeat"  # zset, score = last ping timestamp
+DRIVER_PERSIST_KEY = "drivers:persist"  # hash, latest ping waiting for postgres
+DRIVER_VERIFIED_KEY = "drivers:verified"  # set of approved, enabled drivers
+DRIVER_CAR_MODEL_KEY = "drivers:car_model"  # hash, driver id --> car model id
+DRIVER_BUSY_KEY = "drivers:busy"  # set of drivers on a trip
+
+DRIVER_HEARTBEAT_TTL = config(
+    "DRIVER_HEARTBEAT_TTL", cast=int, default=30
+)  # seconds without a ping before a driver is offline
+DRIVER_LOCATION_FLUSH_INTERVAL = config(
+    "DRIVER_LOCATION_FLUSH_INTERVAL", cast=int, default=30
+)  # seconds, at most one stored location per driver per interval
+DRIVER_ID_CACHE_TIMEOUT = 3600
+
+
+def driver_id_cache_key(user_id):
+    return f"driver_id:{user_id}"
+
+
+def _driver_meta_commands(pipe, driver_id, verified, car_model_id):
+    member = str(driver_id)
+    if verified:
+        pipe.sadd(DRIVER_VERIFIED_KEY, member)
+    else:
+        pipe.srem(DRIVER_VERIFIED_KEY, member)
+    if car_model_id:
+        pipe.hset(DRIVER_CAR_MODEL_KEY, member, car_model_id)
+    else:
+        pipe.hdel(DRIVER_CAR_MODEL_KEY, member)
+
+
+def _is_verified(driver):
+    return (
+        driver["user__is_driver"]
+        and driver["verification_status"] == VerificationStatus.APPROVED
+        and not driver["disable_account"]
+    )
+
+
+def publish_driver_meta(driver_id=None, user_id=None, redis=None):
+    """
+    وضعیت تایید و مدل ماشین راننده در redis، برای فیلتر جستجوی نزدیک‌ترین راننده بدون sql
+    """
+    redis = redis or get_redis()
+    lookup = {"id": driver_id} if driver_id else {"user_id": user_id}
+    driver = (
+        Driver.objects.filter(**lookup)
+        .values("id", "user__is_driver", "verification_status", "disable_account")
+        .first()
+    )
+    if driver is None:
+        return
+    driver_id = driver["id"]
+    car_model_id = (
+        DriverCar.objects.filter(driver_id=driver_id, is_active=True, car__isnull=False)
+        .values_list("car__model_id", flat=True)
+        .order_by("-id")
+        .first()
+    )
+    with redis.pipeline(transaction=False) as pipe:
+        _driver_meta_commands(pipe, driver_id, _is_verified(driver), car_model_id)
+        pipe.execute()
+
+
+def get_driver_id(user_id):
+    cache_key = driver_id_cache_key(user_id)
+    driver_id = cache.get(cache_key)
+    if driver_id is None:
+        driver = (
+            Driver.objects.filter(user_id=user_id, user__is_driver=True)
+            .values("id", "disable_account")
+            .first()
+        )
+        if driver is None or driver["disable_account"]:
+            driver_id = 0
+        else:
+            driver_id = driver["id"]
+            publish_driver_meta(driver_id)
+        cache.set(cache_key, driver_id, timeout=DRIVER_ID_CACHE_TIMEOUT)
+    return driver_id or None
+
+
+async def a_get_driver_id(user_id):
+    """
+    شناسه راننده از روی کاربر، فقط در اولین درخواست به دیتابیس می‌رود
+    """
+    cache_key = driver_id_cache_key(user_id)
+    driver_id = await cache.aget(cache_key)
+    if driver_id is None:
+        driver = (
+            await Driver.objects.filter(user_id=user_id, user__is_driver=True)
+            .values("id", "user__is_driver", "verification_status", "disable_account")
+            .afirst()
+        )
+        if driver is None or driver["disable_account"]:
+            # 0 --> not a driver, cached too so it does not hit the db again
+            driver_id = 0
+        else:
+            driver_id = driver["id"]
+            car_model_id = (
+                await DriverCar.objects.filter(
+                    driver_id=driver_id, is_active=True, car__isnull=False
+                )
+                .values_list("car__model_id", flat=True)
+                .order_by("-id")
+                .afirst()
+            )
+            async with get_async_redis().pipeline(transaction=False) as pipe:
+                _driver_meta_commands(
+                    pipe, driver_id, _is_verified(driver), car_model_id
+                )
+                await pipe.execute()
+        await cache.aset(cache_key, driver_id, timeout=DRIVER_ID_CACHE_TIMEOUT)
+    return driver_id or None
+
+
+async def a_ingest_pings(driver_id, pings):
+    """
+    pings = [{"lat": ..., "lng": ..., "ts": ...}, ...]
+    آخرین موقعیت در GEO set نوشته می‌شود و heartbeat راننده تمدید می‌شود
+    ذخیره در postgres به صورت دسته‌ای و نمونه برداری شده (flush_driver_locations)
+    """
+    now = time.time()
+    latest = max(pings, key=lambda ping: ping.get("ts") or now)
+    lat, lng = latest["lat"], latest["lng"]
+    ts = latest.get("ts") or now
+    member = str(driver_id)
+
+    redis = get_async_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.geoadd(DRIVER_GEO_KEY, (lng, lat, member))
+        pipe.zadd(DRIVER_HEARTBEAT_KEY, {member: now})
+        pipe.hset(DRIVER_PERSIST_KEY, member, f"{lat},{lng},{ts}")
+        await pipe.execute()
+    return {"lat": lat, "lng": lng, "ts": ts}
+
+
+def prune_offline_drivers():
+    """
+    راننده‌هایی که در DRIVER_HEARTBEAT_TTL ثانیه اخیر موقعیت نفرستاده‌اند حذف می‌شوند
+    """
+    redis = get_redis()
+    cutoff = time.time() - DRIVER_HEARTBEAT_TTL
+    offline = redis.zrangebyscore(DRIVER_HEARTBEAT_KEY, "-inf", cutoff)
+    if offline:
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(DRIVER_HEARTBEAT_KEY, *offline)
+            pipe.zrem(DRIVER_GEO_KEY, *offline)
+            pipe.execute()
+    return len(offline)
+
+
+def flush_driver_locations(batch_size=1000):
+    """
+    آخرین موقعیت هر راننده در بازه flush یکجا در postgres ذخیره می‌شود
+    اگر flush قبلی نیمه کاره مانده باشد اول همان دوباره ذخیره می‌شود
+    """
+    redis = get_redis()
+    flushing_key = f"{DRIVER_PERSIST_KEY}:flushing"
+    if not redis.exists(flushing_key):
+        try:
+            redis.rename(DRIVER_PERSIST_KEY, flushing_key)
+        except ResponseError:
+            # no pings since the last flush
+            return 0
+
+    rows = redis.hgetall(flushing_key)
+    locations = []
+    for driver_id, value in rows.items():
+        lat, lng, ts = value.decode().split(",")
+        locations.append(
+            DriverLocation(
+                driver_id=int(driver_id),
+                lat=lat,
+                lng=lng,
+                recorded_at=datetime.datetime.fromtimestamp(
+                    float(ts), tz=datetime.timezone.utc
+                ),
+            )
+        )
+    DriverLocation.objects.bulk_create(locations, batch_size=batch_size)
+    redis.delete(flushing_key)
+    return len(locations)
@@ -0,0 +1,109 @@
+import time
+
+from decouple import config
+
+from apps.trip_app.models import TripType
+from apps.trip_app.services.locations import (
+    DRIVER_GEO_KEY,
+    DRIVER_HEARTBEAT_KEY,
+    DRIVER_VERIFIED_KEY,
+    DRIVER_CAR_MODEL_KEY,
+    DRIVER_BUSY_KEY,
+    DRIVER_HEARTBEAT_TTL,
+)
+from base.utils.redis_conn import get_redis
+from base.utils.tiered_cache import get_tiered_cache
+
+NEARBY_DRIVERS_RADIUS_KM = config("NEARBY_DRIVERS_RADIUS_KM", cast=float, default=5)
+NEARBY_DRIVERS_MAX_RADIUS_KM = 20
+NEARBY_DRIVERS_MAX_K = 50
+# candidates fetched per wanted driver, most of them are filtered out (busy, other car)
+NEARBY_DRIVERS_OVERFETCH = 4
+NEARBY_DRIVERS_MAX_CANDIDATES = 2000
+TRIP_TYPE_CAR_MODELS_TIMEOUT = 3600
+
+# invalidated by the m2m_changed signal of TripType.car_models
+trip_type_car_models_cache = get_tiered_cache(
+    "trip_type_car_models", timeout=TRIP_TYPE_CAR_MODELS_TIMEOUT
+)
+
+
+def get_trip_type_car_models(trip_type_id):
+    """
+    مدل‌های ماشین مجاز برای نوع سفر، None یعنی محدودیتی ندارد
+    """
+    car_models = trip_type_car_models_cache.get_or_set(
+        trip_type_id,
+        lambda: list(
+            TripType.car_models.through.objects.filter(
+                triptype_id=trip_type_id
+            ).values_list("carmodel_id", flat=True)
+        ),
+    )
+    return set(car_models) or None
+
+
+def _filter_candidates(redis, candidates, car_model_ids):
+    members = [member for member, _, _ in candidates]
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.smismember(DRIVER_VERIFIED_KEY, members)
+        pipe.hmget(DRIVER_CAR_MODEL_KEY, members)
+        pipe.zmscore(DRIVER_HEARTBEAT_KEY, members)
+        pipe.smismember(DRIVER_BUSY_KEY, members)
+        verified, car_models, heartbeats, busy = pipe.execute()
+
+    cutoff = time.time() - DRIVER_HEARTBEAT_TTL
+    for index, (member, distance, (lng, lat)) in enumerate(candidates):
+        if not verified[index] or busy[index]:
+            continue
+        # not yet pruned from the GEO set
+        if heartbeats[index] is None or heartbeats[index] < cutoff:
+            continue
+        car_model_id = int(car_models[index]) if car_models[index] else None
+        if car_model_ids is not None and car_model_id not in car_model_ids:
+            continue
+        yield {
+            "driver_id": int(member),
+            "distance_km": round(distance, 3),
+            "lat": lat,
+            "lng": lng,
+            "car_model_id": car_model_id,
+        }
+
+
+def nearby_drivers(
+    lat,
+    lng,
+    radius_km=NEARBY_DRIVERS_RADIUS_KM,
+    k=10,
+    car_model_ids=None,
+    redis=None,
+):
+    """
+    k راننده آزاد و تایید شده نزدیک به نقطه، به ترتیب فاصله
+    جستجو روی GEO set در redis و فیلترها با یک pipeline (بدون sql)
+    """
+    redis = redis or get_redis()
+    count = min(k * NEARBY_DRIVERS_OVERFETCH, NEARBY_DRIVERS_MAX_CANDIDATES)
+    while True:
+        candidates = redis.geosearch(
+            DRIVER_GEO_KEY,
+            longitude=float(lng),
+            latitude=float(lat),
+            radius=radius_km,
+            unit="km",
+            sort="ASC",
+            count=count,
+            withdist=True,
+            withcoord=True,
+        )
+        drivers = []
+        if candidates:
+            for driver in _filter_candidates(redis, candidates, car_model_ids):
+                drivers.append(driver)
+                if len(drivers) == k:
+                    return drivers
+        # the radius has no more drivers, or we looked at enough of them
+        if len(candidates) < count or count >= NEARBY_DRIVERS_MAX_CANDIDATES:
+            return drivers
+        count = min(count * 4, NEARBY_DRIVERS_MAX_CANDIDATES)
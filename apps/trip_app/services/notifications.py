@@ -0,0 +1,16 @@
+from apps.auth_app.services.notifications import push_notification
+
+# status --> (title, body)
+TRIP_STATUS_NOTIFICATIONS = {
+    "pending": ("ثبت سفر", "درخواست سفر شما ثبت شد"),
+    "reserve": ("رزور سفر", "درخواست رزور سفر شما ثبت شد"),
+    "confirmed": ("تایید سفر", "درخواست  سفر شما ثبت شد توسط راننده ای تایید شد"),
+    "completed": ("تکمیل سفر", "سفر شما پایان و تکمیل شد"),
+    "cancelled": ("لغو سفر", "سفر شما لغو شد"),
+}
+
+
+def notify_trip_status(user_id, status):
+    message = TRIP_STATUS_NOTIFICATIONS.get(status)
+    if message is not None:
+        push_notification(user_id, *message)
@@ -0,0 +1,139 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+from apps.trip_app.models import TripPrice, TripType
+from apps.trip_app.services.surge import get_surge_permille
+from apps.trip_app.tasks import warm_route_distances_celery
+from base.utils.neshan import route_distance, claim_route_warmup
+
+PRICE_TABLE_VERSION_KEY = "trip_price:version"
+# seconds a worker trusts its table before checking the version
+PRICE_TABLE_REFRESH = 1.0
+
+
+class _TypePrices:
+    """
+    بازه‌های قیمت یک نوع سفر، همه به عدد صحیح (متر و واحد خرد پول)
+    """
+
+    __slots__ = ("trip_type_id", "trip_name", "from_m", "per_km_minor", "traffic")
+
+    def __init__(self, trip_type_id, trip_name, rows):
+        rows = sorted(rows, key=lambda row: row[0])
+        self.trip_type_id = trip_type_id
+        self.trip_name = trip_name
+        self.from_m = [row[0] for row in rows]
+        self.per_km_minor = [row[1] for row in rows]
+        self.traffic = [row[2] for row in rows]
+
+    def price_minor(self, distance_m):
+        index = bisect.bisect_right(self.from_m, distance_m) - 1
+        if index < 0:
+            # shorter than the first bracket, the first bracket is the minimum
+            index = 0
+        numerator = distance_m * self.per_km_minor[index] * (100 + self.traffic[index])
+        denominator = 1000 * 100
+        # round half up, integers only
+        return (numerator + denominator // 2) // denominator
+
+
+_lock = threading.Lock()
+_table = None
+_table_version = None
+_checked_at = 0.0
+
+
+def invalidate_price_table():
+    cache.set(PRICE_TABLE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _load_table():
+    rows = {}
+    prices = TripPrice.objects.filter(is_active=True).values_list(
+        "trip_type_id", "distance_km", "price_per_km", "traffic_factor"
+    )
+    for trip_type_id, distance_km, price_per_km, traffic_factor in prices:
+        rows.setdefault(trip_type_id, []).append(
+            (int(distance_km * 1000), int(price_per_km * 100), traffic_factor)
+        )
+
+    default_rows = rows.get(None)
+    table = []
+    for trip_type_id, trip_name in TripType.objects.filter(is_active=True).values_list(
+        "id", "trip_name"
+    ):
+        type_rows = rows.get(trip_type_id) or default_rows
+        if type_rows:
+            table.append(_TypePrices(trip_type_id, trip_name, type_rows))
+    return table
+
+
+def get_price_table():
+    """
+    جدول قیمت یکبار از دیتابیس خوانده و در حافظه پروسه نگه داشته می‌شود
+    با تغییر TripPrice یا TripType نسخه در redis عوض و جدول دوباره ساخته می‌شود
+    """
+    global _table, _table_version, _checked_at
+    now = time.monotonic()
+    if _table is not None and now - _checked_at < PRICE_TABLE_REFRESH:
+        return _table
+
+    version = cache.get(PRICE_TABLE_VERSION_KEY)
+    if version is None:
+        invalidate_price_table()
+        version = cache.get(PRICE_TABLE_VERSION_KEY)
+    if _table is None or version != _table_version:
+        with _lock:
+            if _table is None or version != _table_version:
+                _table = _load_table()
+                _table_version = version
+    _checked_at = now
+    return _table
+
+
+def _warm_route(origin, destination):
+    if not claim_route_warmup(origin, destination):
+        return
+    try:
+        warm_route_distances_celery.delay([(origin, destination)])
+    except Exception as e:
+        # the quote is answered from the estimate anyway
+        logging.warning("failed to queue route warmup", exc_info=e)
+
+
+def quote_trip(from_lat, from_lng, to_lat, to_lng):
+    """
+    قیمت سفر برای همه نوع سفرهای فعال در یک فراخوانی
+    price_minor به واحد خرد (یک صدم) و price گرد شده به واحد پول
+    ضریب surge از سلول مبدا خوانده می‌شود (services/surge.py)
+    بدون کش فاصله، تخمین محلی برگردانده و فاصله نشان در پس‌زمینه گرفته می‌شود
+    """
+    origin = (float(from_lat), float(from_lng))
+    destination = (float(to_lat), float(to_lng))
+    route = route_distance(origin, destination, fetch=False)
+    if route["source"] == "estimate":
+        _warm_route(origin, destination)
+    distance_m = route["distance_m"]
+    surge = get_surge_permille(from_lat, from_lng)
+    quotes = []
+    for prices in get_price_table():
+        price_minor = (prices.price_minor(distance_m) * surge + 500) // 1000
+        quotes.append(
+            {
+                "trip_type": prices.trip_type_id,
+                "trip_name": prices.trip_name,
+                "price_minor": price_minor,
+                "price": (price_minor + 50) // 100,
+            }
+        )
+    return {
+        "distance_km": round(distance_m / 1000, 2),
+        "duration_s": route["duration_s"],
+        "distance_source": route["source"],
+        "surge": surge / 1000,
+        "quotes": quotes,
+    }
@@ -0,0 +1,138 @@
+import heapq
+import math
+import time
+
+from decouple import config
+
+from base.utils.geo import EARTH_RADIUS_KM
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DRIVER_IDLE_SINCE_KEY = "drivers:idle_since"  # hash, driver id --> end of last trip
+DRIVER_OFFERS_KEY = "drivers:offers"  # hash, driver id --> offers received
+DRIVER_ACCEPTS_KEY = "drivers:accepts"  # hash, driver id --> offers accepted
+
+RANKING_WEIGHTS = {
+    "distance": config("RANKING_WEIGHT_DISTANCE", cast=float, default=1.0),
+    "idle": config("RANKING_WEIGHT_IDLE", cast=float, default=0.3),
+    "acceptance": config("RANKING_WEIGHT_ACCEPTANCE", cast=float, default=0.5),
+    "car_match": config("RANKING_WEIGHT_CAR_MATCH", cast=float, default=0.2),
+}
+RANKING_DISTANCE_SCALE_KM = 5.0  # distance feature = km / scale
+RANKING_IDLE_CAP = 1800  # seconds, longer idle times count the same
+RANKING_DEFAULT_IDLE = 600  # seconds, driver without a finished trip yet
+
+
+def load_features(redis, candidates, car_model_ids=None):
+    """
+    candidates = خروجی nearby_drivers
+    خروجی ستونی (لیست برای هر ویژگی) برای rank_candidates
+    """
+    if not candidates:
+        return {"driver_id": []}
+    members = [str(driver["driver_id"]) for driver in candidates]
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.hmget(DRIVER_IDLE_SINCE_KEY, members)
+        pipe.hmget(DRIVER_OFFERS_KEY, members)
+        pipe.hmget(DRIVER_ACCEPTS_KEY, members)
+        idle_since, offers, accepts = pipe.execute()
+
+    now = time.time()
+    return {
+        "driver_id": [driver["driver_id"] for driver in candidates],
+        "lat": [driver["lat"] for driver in candidates],
+        "lng": [driver["lng"] for driver in candidates],
+        "idle_seconds": [
+            now - float(since) if since else RANKING_DEFAULT_IDLE
+            for since in idle_since
+        ],
+        # laplace smoothing, new drivers start at 0.5
+        "acceptance_rate": [
+            (int(accepted or 0) + 1) / (int(offered or 0) + 2)
+            for offered, accepted in zip(offers, accepts)
+        ],
+        "car_match": [
+            1.0 if car_model_ids and driver["car_model_id"] in car_model_ids else 0.0
+            for driver in candidates
+        ],
+    }
+
+
+def _rank_numpy(lat, lng, features, k, weights):
+    lats = np.radians(np.asarray(features["lat"], dtype=np.float64))
+    lngs = np.radians(np.asarray(features["lng"], dtype=np.float64))
+    lat, lng = math.radians(lat), math.radians(lng)
+
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    )
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    idle = np.minimum(
+        np.asarray(features["idle_seconds"], dtype=np.float64), RANKING_IDLE_CAP
+    )
+
+    score = (
+        weights["idle"] * idle / RANKING_IDLE_CAP
+        + weights["acceptance"]
+        * np.asarray(features["acceptance_rate"], dtype=np.float64)
+        + weights["car_match"] * np.asarray(features["car_match"], dtype=np.float64)
+        - weights["distance"] * distance / RANKING_DISTANCE_SCALE_KM
+    )
+
+    if k < len(score):
+        # O(n) selection, only the k winners are sorted
+        top = np.argpartition(-score, k - 1)[:k]
+    else:
+        top = np.arange(len(score))
+    top = top[np.argsort(-score[top], kind="stable")]
+
+    driver_ids = features["driver_id"]
+    return [
+        {
+            "driver_id": driver_ids[i],
+            "score": float(score[i]),
+            "distance_km": float(distance[i]),
+        }
+        for i in top.tolist()
+    ]
+
+
+def _rank_python(lat, lng, features, k, weights):
+    lat_r, lng_r = math.radians(lat), math.radians(lng)
+    cos_lat = math.cos(lat_r)
+    ranked = []
+    for i, driver_id in enumerate(features["driver_id"]):
+        d_lat = math.radians(features["lat"][i])
+        d_lng = math.radians(features["lng"][i])
+        a = (
+            math.sin((d_lat - lat_r) / 2) ** 2
+            + cos_lat * math.cos(d_lat) * math.sin((d_lng - lng_r) / 2) ** 2
+        )
+        distance = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+        idle = min(features["idle_seconds"][i], RANKING_IDLE_CAP)
+        score = (
+            weights["idle"] * idle / RANKING_IDLE_CAP
+            + weights["acceptance"] * features["acceptance_rate"][i]
+            + weights["car_match"] * features["car_match"][i]
+            - weights["distance"] * distance / RANKING_DISTANCE_SCALE_KM
+        )
+        ranked.append({"driver_id": driver_id, "score": score, "distance_km": distance})
+    return heapq.nlargest(k, ranked, key=lambda driver: driver["score"])
+
+
+def rank_candidates(lat, lng, features, k, weights=None, use_numpy=True):
+    """
+    امتیاز همه کاندیداها یکجا (فاصله، زمان بیکاری، نرخ پذیرش، تطابق ماشین)
+    :return: k راننده برتر به ترتیب امتیاز
+    """
+    if not features["driver_id"]:
+        return []
+    weights = {**RANKING_WEIGHTS, **(weights or {})}
+    lat, lng = float(lat), float(lng)
+    if use_numpy and np is not None:
+        return _rank_numpy(lat, lng, features, k, weights)
+    return _rank_python(lat, lng, features, k, weights)
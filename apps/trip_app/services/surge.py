@@ -0,0 +1,134 @@
+import datetime
+import threading
+import time
+from collections import Counter
+
+import msgpack
+from decouple import config
+from django.utils import timezone
+
+from apps.trip_app.models import Trip
+from apps.trip_app.services.locations import (
+    DRIVER_GEO_KEY,
+    DRIVER_HEARTBEAT_KEY,
+    DRIVER_BUSY_KEY,
+    DRIVER_HEARTBEAT_TTL,
+)
+from base.utils.geo import geohash_encode
+from base.utils.redis_conn import get_redis
+
+SURGE_TABLE_KEY = "surge:table"  # msgpack blob, cell --> multiplier in permille
+SURGE_VERSION_KEY = "surge:version"
+SURGE_PRECISION = config(
+    "SURGE_PRECISION", cast=int, default=6
+)  # geohash cell, 6 --> ~1.2km x 0.6km
+SURGE_INTERVAL = config(
+    "SURGE_INTERVAL", cast=int, default=30
+)  # seconds between two computations
+SURGE_DEMAND_WINDOW = config(
+    "SURGE_DEMAND_WINDOW", cast=int, default=600
+)  # seconds, older pending trips are not demand anymore
+SURGE_THRESHOLD = config(
+    "SURGE_THRESHOLD", cast=float, default=1.0
+)  # demand / supply ratio where surge starts
+SURGE_SENSITIVITY = config("SURGE_SENSITIVITY", cast=float, default=0.25)
+SURGE_MAX = config("SURGE_MAX", cast=float, default=2.5)
+SURGE_REFRESH = 5.0  # seconds a worker trusts its copy of the table
+NO_SURGE = 1000  # permille
+
+GEOHASH_CHUNK = 5000
+
+
+def _demand(precision):
+    since = timezone.now() - datetime.timedelta(seconds=SURGE_DEMAND_WINDOW)
+    points = Trip.objects.filter(
+        status="pending", is_active=True, from_lat__isnull=False, created_at__gte=since
+    ).values_list("from_lat", "from_lng")
+    return Counter(geohash_encode(lat, lng, precision) for lat, lng in points)
+
+
+def _supply(redis, precision):
+    """
+    راننده‌های آنلاین و آزاد به تفکیک سلول، geohash مستقیم از GEO set خوانده می‌شود
+    """
+    cutoff = time.time() - DRIVER_HEARTBEAT_TTL
+    with redis.pipeline(transaction=False) as pipe:
+        pipe.zrangebyscore(DRIVER_HEARTBEAT_KEY, cutoff, "+inf")
+        pipe.smembers(DRIVER_BUSY_KEY)
+        online, busy = pipe.execute()
+
+    free = [member for member in online if member not in busy]
+    supply = Counter()
+    for start in range(0, len(free), GEOHASH_CHUNK):
+        chunk = free[start : start + GEOHASH_CHUNK]
+        for geohash in redis.geohash(DRIVER_GEO_KEY, *chunk):
+            if geohash:
+                supply[geohash[:precision]] += 1
+    return supply
+
+
+def surge_permille(demand, supply):
+    ratio = demand / max(supply, 1)
+    multiplier = 1 + SURGE_SENSITIVITY * (ratio - SURGE_THRESHOLD)
+    multiplier = min(max(multiplier, 1.0), SURGE_MAX)
+    # 0.1 steps, the price should not jump on every small change
+    return round(multiplier * 10) * 100
+
+
+def compute_surge_table(precision=SURGE_PRECISION):
+    """
+    ضریب افزایش قیمت هر سلول (تقاضا به عرضه) و انتشار کل جدول به صورت یک blob در redis
+    فقط سلول‌هایی با ضریب بیشتر از 1 ذخیره می‌شوند
+    """
+    redis = get_redis()
+    demand = _demand(precision)
+    supply = _supply(redis, precision)
+    cells = {}
+    for cell, count in demand.items():
+        permille = surge_permille(count, supply.get(cell, 0))
+        if permille > NO_SURGE:
+            cells[cell] = permille
+
+    version = time.time_ns()
+    blob = msgpack.packb({"version": version, "precision": precision, "cells": cells})
+    # an old table expires if the job stops, prices fall back to no surge
+    with redis.pipeline(transaction=True) as pipe:
+        pipe.set(SURGE_TABLE_KEY, blob, ex=SURGE_INTERVAL * 4)
+        pipe.set(SURGE_VERSION_KEY, version, ex=SURGE_INTERVAL * 4)
+        pipe.execute()
+    return cells
+
+
+_lock = threading.Lock()
+_table = {"version": None, "precision": SURGE_PRECISION, "cells": {}}
+_checked_at = 0.0
+
+
+def get_surge_table():
+    global _table, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < SURGE_REFRESH:
+        return _table
+
+    with _lock:
+        if now - _checked_at >= SURGE_REFRESH:
+            redis = get_redis()
+            version = redis.get(SURGE_VERSION_KEY)
+            if version is None:
+                _table = {"version": None, "precision": SURGE_PRECISION, "cells": {}}
+            elif int(version) != _table["version"]:
+                blob = redis.get(SURGE_TABLE_KEY)
+                if blob is not None:
+                    _table = msgpack.unpackb(blob)
+            _checked_at = now
+    return _table
+
+
+def get_surge_permille(lat, lng):
+    """
+    O(1): یک geohash و یک lookup روی نسخه داخل حافظه جدول
+    """
+    table = get_surge_table()
+    if not table["cells"]:
+        return NO_SURGE
+    return table["cells"].get(geohash_encode(lat, lng, table["precision"]), NO_SURGE)
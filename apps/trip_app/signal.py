@@ -1,22 +1,108 @@
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from apps.trip_app.models import TripType, Trip
-from apps.trip_app.tasks import create_notification_trip_celery
+from apps.auth_app.models import Driver, DriverCar, User, Passenger
+from apps.core_app.services.outbox import publish_event
+from apps.trip_app.models import TripType, Trip, TripPrice
+from apps.trip_app.services.locations import driver_id_cache_key, publish_driver_meta
+from apps.trip_app.services.nearby import trip_type_car_models_cache
+from apps.trip_app.services.pricing import invalidate_price_table
+from base.utils.tiered_cache import get_tiered_cache
 
 
 @receiver(post_save, sender=TripType)
-def clear_cache_trip_type(sender, created, **kwargs):
-    cache.delete("trip_type")
+@receiver(post_delete, sender=TripType)
+def clear_cache_trip_type(sender, **kwargs):
+    transaction.on_commit(get_tiered_cache("trip_type").invalidate)
+    transaction.on_commit(invalidate_price_table)
+
+
+@receiver(post_save, sender=TripPrice)
+@receiver(post_delete, sender=TripPrice)
+def invalidate_price_table_after_change_trip_price(sender, **kwargs):
+    transaction.on_commit(invalidate_price_table)
+
+
+@receiver(m2m_changed, sender=TripType.car_models.through)
+def clear_cache_trip_type_car_models(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        # instance is a CarModel when changed from the reverse side
+        transaction.on_commit(trip_type_car_models_cache.invalidate)
+
+
+def trip_user_id(trip):
+    # passenger set by the serializer already carries user_id, no extra query
+    if Trip.passenger.is_cached(trip):
+        return trip.passenger.user_id
+    return (
+        Passenger.objects.filter(id=trip.passenger_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
 
 
 @receiver(post_save, sender=Trip)
-def send_notification_after_save_trip(sender, created, instance, **kwargs):
-    user_id = instance.passenger.user_id
-    status = instance.status
+def trip_status_changed(sender, created, instance, update_fields=None, **kwargs):
+    """
+    فقط وقتی وضعیت سفر واقعا تغییر کرده: اعلان مسافر، dispatch سفر جدید و آزاد شدن راننده
+    """
+    if update_fields is not None and "status" not in update_fields:
+        return
+    previous, instance._loaded_status = instance._loaded_status, instance.status
+    if not created and previous == instance.status:
+        return
+
+    # same transaction as the save, handled by services.dispatch.after_status_change
+    publish_event(
+        "trip.status_changed",
+        trip_id=instance.id,
+        user_id=trip_user_id(instance),
+        status=instance.status,
+        new_trip=created
+        and instance.status == "pending"
+        and instance.from_lat is not None,
+    )
 
-    transaction.on_commit(
-        lambda: create_notification_trip_celery.delay(user_id=user_id, status=status)
+
+@receiver(post_save, sender=Driver)
+def publish_driver_meta_after_save_driver(sender, instance, **kwargs):
+    user_id, driver_id = instance.user_id, instance.id
+
+    def publish():
+        cache.delete(driver_id_cache_key(user_id))
+        publish_driver_meta(driver_id)
+
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=DriverCar)
+def publish_driver_meta_after_save_driver_car(sender, instance, **kwargs):
+    driver_id = instance.driver_id
+    transaction.on_commit(lambda: publish_driver_meta(driver_id))
+
+
+@receiver(post_save, sender=User)
+def publish_driver_meta_after_save_user(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    """
+    از فیلدهای کاربر فقط is_driver در driver meta است
+    """
+    if update_fields is not None and "is_driver" not in update_fields:
+        return
+    previous, instance._loaded_is_driver = (
+        instance._loaded_is_driver,
+        instance.is_driver,
     )
+    # a new user has no driver row yet
+    if created or previous == instance.is_driver:
+        return
+    user_id = instance.id
+
+    def publish():
+        cache.delete(driver_id_cache_key(user_id))
+        publish_driver_meta(user_id=user_id)
+
+    transaction.on_commit(publish)
@@ -1,32 +1,81 @@
+import logging
+
 from celery import shared_task
 
-from apps.auth_app.models import UserNotification
+from apps.trip_app.services.dispatch import (
+    dispatch_trip,
+    sweep_dispatch,
+    after_accept,
+    after_status_change,
+)
+from apps.trip_app.services.surge import compute_surge_table
+from apps.trip_app.services.notifications import notify_trip_status
+from apps.trip_app.services.locations import (
+    flush_driver_locations,
+    prune_offline_drivers,
+)
+from base.utils.neshan import route_distances
 
 
 @shared_task(queue="notifications", bind=True, max_retries=2)
 def create_notification_trip_celery(self, user_id, status):
+    # kept for tasks already in the queue, new producers call notify_trip_status
     try:
-        if status == "pending":
-            UserNotification.objects.create(
-                user_id=user_id, title="ثبت سفر", body="درخواست سفر شما ثبت شد"
-            )
-        if status == "reserve":
-            UserNotification.objects.create(
-                user_id=user_id, title="رزور سفر", body="درخواست رزور سفر شما ثبت شد"
-            )
-        if status == "confirmed":
-            UserNotification.objects.create(
-                user_id=user_id,
-                title="تایید سفر",
-                body="درخواست  سفر شما ثبت شد توسط راننده ای تایید شد",
-            )
-        if status == "completed":
-            UserNotification.objects.create(
-                user_id=user_id, title="تکمیل سفر", body="سفر شما پایان و تکمیل شد"
-            )
-        if status == "cancelled":
-            UserNotification.objects.create(
-                user_id=user_id, title="لغو سفر", body="سفر شما لغو شد"
-            )
+        notify_trip_status(user_id, status)
     except Exception as e:
         raise self.retry(exc=e)
+
+
+@shared_task(queue="locations", bind=True, max_retries=2)
+def flush_driver_locations_celery(self):
+    try:
+        prune_offline_drivers()
+        flush_driver_locations()
+    except Exception as e:
+        logging.error("failed to flush driver locations", exc_info=e)
+        raise self.retry(exc=e, countdown=5)
+
+
+@shared_task(queue="dispatch", bind=True, max_retries=2)
+def dispatch_trip_celery(self, trip_id):
+    try:
+        dispatch_trip(trip_id)
+    except Exception as e:
+        # the sweeper dispatches it anyway once the offer timeout passes
+        logging.error("failed to dispatch trip %s", trip_id, exc_info=e)
+        raise self.retry(exc=e, countdown=1)
+
+
+@shared_task(queue="dispatch", bind=True, max_retries=2)
+def trip_status_changed_celery(self, trip_id, user_id, status, new_trip):
+    try:
+        after_status_change(trip_id, user_id, status, new_trip)
+    except Exception as e:
+        logging.error("failed to handle trip %s status change", trip_id, exc_info=e)
+        raise self.retry(exc=e, countdown=1)
+
+
+@shared_task(queue="dispatch", bind=True, max_retries=2)
+def trip_accepted_celery(self, trip_id, driver_id, user_id):
+    try:
+        after_accept(trip_id, driver_id, user_id)
+    except Exception as e:
+        logging.error("failed to handle trip %s acceptance", trip_id, exc_info=e)
+        raise self.retry(exc=e, countdown=1)
+
+
+@shared_task(queue="dispatch", bind=True, max_retries=0)
+def sweep_dispatch_celery(self):
+    sweep_dispatch()
+
+
+@shared_task(queue="pricing", bind=True, max_retries=0)
+def compute_surge_celery(self):
+    # no retry, the next beat run publishes a fresh table anyway
+    compute_surge_table()
+
+
+@shared_task(queue="pricing", bind=True, max_retries=0)
+def warm_route_distances_celery(self, pairs):
+    # fills the distance cache for the next quote, no retry, the quote was answered
+    route_distances(pairs)
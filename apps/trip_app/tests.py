@@ -1,3 +1,396 @@
-from django.test import TestCase
+import datetime
+import time
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apis.utils.custom_exceptions import (
+    OfferExpiredException,
+    TripAlreadyTakenException,
+)
+from apps.auth_app.models import User
+from apps.trip_app.models import Trip, TripPrice, TripReservation, TripType
+from apps.trip_app.services.dispatch import (
+    DISPATCH_MAX_WAVES,
+    DISPATCH_WAVE_SIZE,
+    accept_offer,
+    driver_offer_key,
+    get_driver_offer,
+    sweep_dispatch,
+    trip_wave_key,
+)
+from apps.trip_app.services.locations import (
+    DRIVER_BUSY_KEY,
+    DRIVER_CAR_MODEL_KEY,
+    DRIVER_GEO_KEY,
+    DRIVER_HEARTBEAT_KEY,
+    DRIVER_VERIFIED_KEY,
+)
+from apps.trip_app.services import dispatch, ranking
+from apps.trip_app.services.pricing import (
+    PRICE_TABLE_VERSION_KEY,
+    _TypePrices,
+    invalidate_price_table,
+    quote_trip,
+)
+from apps.trip_app.services.ranking import (
+    DRIVER_ACCEPTS_KEY,
+    DRIVER_IDLE_SINCE_KEY,
+    DRIVER_OFFERS_KEY,
+    rank_candidates,
+)
+from apps.trip_app.tasks import warm_route_distances_celery
+from base.utils.neshan import distance_cache_key
+from base.utils.redis_conn import get_redis
+
+
+def create_user(phone, **kwargs):
+    return User.objects.create_user(
+        phone=phone, username=phone, password="password", **kwargs
+    )
+
+
+def create_trip(user, **kwargs):
+    fields = {
+        "from_lat": "35.700000000000000",
+        "from_lng": "51.400000000000000",
+        "to_lat": "35.750000000000000",
+        "to_lng": "51.450000000000000",
+    }
+    fields.update(kwargs)
+    return Trip.objects.create(passenger=user.user_passengers, **fields)
+
+
+class NearbyDriversViewTests(TestCase):
+    url = reverse("v1_trip:nearby_drivers")
+
+    def setUp(self):
+        self.owner = create_user("09120000001")
+        self.other = create_user("09120000002")
+        self.trip = create_trip(self.owner)
+        self.client = APIClient()
+
+    def test_owner_searches_around_own_trip(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(self.url, {"trip": self.trip.id})
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_passenger_trip_is_not_found(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.get(self.url, {"trip": self.trip.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_can_search_any_trip(self):
+        self.other.is_staff = True
+        self.other.save(update_fields=["is_staff"])
+        self.client.force_authenticate(self.other)
+        response = self.client.get(self.url, {"trip": self.trip.id})
+        self.assertEqual(response.status_code, 200)
+
+
+@mock.patch("apps.trip_app.signal.publish_driver_meta")
+class DriverMetaSignalTests(TestCase):
+    def setUp(self):
+        create_user("09120000003")
+        # loaded from the database, like every save outside of sign up
+        self.user = User.objects.get(phone="09120000003")
+
+    def save(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(**kwargs)
+
+    def user_calls(self, publish_driver_meta):
+        # a new driver row publishes on its own (driver signal)
+        return [c for c in publish_driver_meta.call_args_list if "user_id" in c.kwargs]
+
+    def test_unrelated_fields_do_not_republish(self, publish_driver_meta):
+        self.user.first_name = "علی"
+        self.save()
+        self.user.email = "ali@safiro.ir"
+        self.save(update_fields=["email"])
+        publish_driver_meta.assert_not_called()
+
+    def test_is_driver_change_republishes_once(self, publish_driver_meta):
+        self.user.is_driver = True
+        self.save()
+        self.assertEqual(
+            self.user_calls(publish_driver_meta), [mock.call(user_id=self.user.id)]
+        )
+        # same value again
+        self.save()
+        self.assertEqual(len(self.user_calls(publish_driver_meta)), 1)
+
+    def test_is_driver_in_update_fields(self, publish_driver_meta):
+        self.user.is_driver = True
+        self.save(update_fields=["is_driver"])
+        self.assertEqual(
+            self.user_calls(publish_driver_meta), [mock.call(user_id=self.user.id)]
+        )
+
+
+def clear_dispatch_keys(redis):
+    keys = [
+        DRIVER_GEO_KEY,
+        DRIVER_HEARTBEAT_KEY,
+        DRIVER_VERIFIED_KEY,
+        DRIVER_CAR_MODEL_KEY,
+        DRIVER_BUSY_KEY,
+        DRIVER_IDLE_SINCE_KEY,
+        DRIVER_OFFERS_KEY,
+        DRIVER_ACCEPTS_KEY,
+        *redis.scan_iter("dispatch:*"),
+    ]
+    redis.delete(*keys)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis()
+        clear_dispatch_keys(self.redis)
+        self.addCleanup(clear_dispatch_keys, self.redis)
+
+        self.passenger = create_user("09120000010")
+        self.drivers = []
+        for index in range(DISPATCH_WAVE_SIZE + 2):
+            user = create_user(f"0912000002{index}", is_driver=True)
+            # the further the driver, the later in the ranking
+            self.online_driver(user.user_driver.id, 35.7 + index * 0.001, 51.4)
+            self.drivers.append(user.user_driver.id)
+
+        self.trip = create_trip(self.passenger)
+        # the outbox event was lost, the sweeper picks the trip up
+        Trip.objects.filter(id=self.trip.id).update(
+            created_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+
+    def online_driver(self, driver_id, lat, lng):
+        member = str(driver_id)
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.geoadd(DRIVER_GEO_KEY, (lng, lat, member))
+            pipe.zadd(DRIVER_HEARTBEAT_KEY, {member: time.time()})
+            pipe.sadd(DRIVER_VERIFIED_KEY, member)
+            pipe.execute()
+
+    def wave(self):
+        return {int(d) for d in self.redis.smembers(trip_wave_key(self.trip.id))}
+
+    def end_wave(self):
+        Trip.objects.filter(id=self.trip.id).update(
+            dispatch_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+    def test_sweep_offers_due_trip_to_nearest_drivers(self):
+        self.assertEqual(sweep_dispatch(), 1)
+        self.assertEqual(self.wave(), set(self.drivers[:DISPATCH_WAVE_SIZE]))
+        trip = Trip.objects.get(id=self.trip.id)
+        self.assertEqual(trip.dispatch_wave, 1)
+        self.assertGreater(trip.dispatch_at, timezone.now())
+        for driver_id in self.wave():
+            self.assertEqual(get_driver_offer(driver_id)["id"], self.trip.id)
+
+    def test_sweep_skips_trip_with_open_wave(self):
+        sweep_dispatch()
+        self.assertEqual(sweep_dispatch(), 0)
+        self.assertEqual(Trip.objects.get(id=self.trip.id).dispatch_wave, 1)
+
+    def test_sweep_does_not_count_trip_handled_by_another_worker(self):
+        real_dispatch_trip = dispatch.dispatch_trip
+
+        def dispatch_trip(trip_id, only_due=False):
+            # another worker dispatches it between our select and lock
+            real_dispatch_trip(trip_id)
+            return real_dispatch_trip(trip_id, only_due=only_due)
+
+        with mock.patch.object(dispatch, "dispatch_trip", side_effect=dispatch_trip):
+            self.assertEqual(sweep_dispatch(), 0)
+        self.assertEqual(Trip.objects.get(id=self.trip.id).dispatch_wave, 1)
+
+    def test_only_one_driver_wins_a_double_accept(self):
+        sweep_dispatch()
+        first, second = sorted(self.wave())[:2]
+        accept_offer(first, self.trip.id)
+        with self.assertRaises(TripAlreadyTakenException):
+            accept_offer(second, self.trip.id)
+
+        self.assertEqual(Trip.objects.get(id=self.trip.id).status, "confirmed")
+        reservations = TripReservation.objects.filter(trip=self.trip)
+        self.assertEqual(
+            list(reservations.values_list("driver_id", flat=True)), [first]
+        )
+
+    def test_offer_expires_when_next_wave_starts(self):
+        sweep_dispatch()
+        first_wave = self.wave()
+        self.end_wave()
+        sweep_dispatch()
+
+        # never offered the same trip twice
+        self.assertFalse(self.wave() & first_wave)
+        for driver_id in first_wave:
+            self.assertIsNone(get_driver_offer(driver_id))
+            with self.assertRaises(OfferExpiredException):
+                accept_offer(driver_id, self.trip.id)
+        self.assertEqual(Trip.objects.get(id=self.trip.id).status, "pending")
+
+    def test_driver_keeps_offer_of_another_trip(self):
+        sweep_dispatch()
+        driver_id = sorted(self.wave())[0]
+        # the key now belongs to another trip, releasing this wave must not drop it
+        self.redis.set(driver_offer_key(driver_id), self.trip.id + 1)
+        self.end_wave()
+        sweep_dispatch()
+        self.assertEqual(
+            int(self.redis.get(driver_offer_key(driver_id))), self.trip.id + 1
+        )
+
+    def test_trip_is_cancelled_after_the_last_wave(self):
+        Trip.objects.filter(id=self.trip.id).update(dispatch_wave=DISPATCH_MAX_WAVES)
+        self.end_wave()
+        self.assertEqual(sweep_dispatch(), 0)
+        self.assertEqual(Trip.objects.get(id=self.trip.id).status, "cancelled")
+
+
+class RankCandidatesTests(SimpleTestCase):
+    features = {
+        "driver_id": [1, 2, 3, 4, 5],
+        "lat": [35.7, 35.701, 35.71, 35.72, 35.7005],
+        "lng": [51.4, 51.4, 51.41, 51.43, 51.4],
+        "idle_seconds": [0, 600, 1800, 3600, 60],
+        "acceptance_rate": [0.5, 0.9, 0.2, 1.0, 0.5],
+        "car_match": [0.0, 1.0, 0.0, 1.0, 1.0],
+    }
+
+    def test_returns_top_k_in_score_order(self):
+        ranked = rank_candidates(35.7, 51.4, self.features, k=3, use_numpy=False)
+        self.assertEqual(len(ranked), 3)
+        scores = [driver["score"] for driver in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    @skipIf(ranking.np is None, "numpy is not installed")
+    def test_numpy_matches_python(self):
+        for k in (1, 3, 10):
+            python = rank_candidates(35.7, 51.4, self.features, k, use_numpy=False)
+            vector = rank_candidates(35.7, 51.4, self.features, k, use_numpy=True)
+            self.assertEqual(
+                [driver["driver_id"] for driver in vector],
+                [driver["driver_id"] for driver in python],
+            )
+            for a, b in zip(vector, python):
+                self.assertAlmostEqual(a["score"], b["score"])
+
+    def test_no_candidates(self):
+        self.assertEqual(rank_candidates(35.7, 51.4, {"driver_id": []}, k=3), [])
+
+
+class TypePricesTests(SimpleTestCase):
+    def setUp(self):
+        # from_m, per_km_minor, traffic percent
+        self.prices = _TypePrices(1, "اقتصادی", [(5000, 800000, 0), (0, 1000000, 10)])
+
+    def test_bracket_by_distance(self):
+        # 3km * 10000.00 * 1.10
+        self.assertEqual(self.prices.price_minor(3000), 3300000)
+        # 5km is the first meter of the second bracket
+        self.assertEqual(self.prices.price_minor(5000), 4000000)
+        self.assertEqual(self.prices.price_minor(7500), 6000000)
+
+    def test_rounds_half_up_with_integers(self):
+        prices = _TypePrices(1, "اقتصادی", [(0, 150, 0)])
+        self.assertEqual(prices.price_minor(3), 0)  # 0.45
+        self.assertEqual(prices.price_minor(4), 1)  # 0.6
+        prices = _TypePrices(1, "اقتصادی", [(0, 500, 0)])
+        self.assertEqual(prices.price_minor(1), 1)  # 0.5
+
+    def test_shorter_than_first_bracket(self):
+        prices = _TypePrices(1, "اقتصادی", [(1000, 100000, 0)])
+        self.assertEqual(prices.price_minor(500), 50000)
+
+
+class QuoteTripTests(TestCase):
+    origin, destination = (35.7, 51.4), (35.72, 51.42)
+
+    def setUp(self):
+        trip_type = TripType.objects.create(trip_name="اقتصادی")
+        TripPrice.objects.create(
+            trip_type=trip_type,
+            distance_km=Decimal("0"),
+            price_per_km=Decimal("12500.50"),
+            traffic_factor=20,
+        )
+        invalidate_price_table()
+
+        route_key = distance_cache_key(self.origin, self.destination)
+        self.keys = [route_key, f"{route_key}:warmup", PRICE_TABLE_VERSION_KEY]
+        cache.delete_many(self.keys)
+        self.addCleanup(cache.delete_many, self.keys)
+
+        patcher = mock.patch(
+            "apps.trip_app.services.pricing.get_surge_permille", return_value=1000
+        )
+        self.surge = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def quote(self):
+        return quote_trip(*self.origin, *self.destination)
+
+    @mock.patch("apps.trip_app.services.pricing.warm_route_distances_celery")
+    def test_cached_route_prices_with_integers(self, warm):
+        cache.set(
+            self.keys[0], {"distance_m": 3250, "duration_s": 600, "source": "neshan"}
+        )
+        result = self.quote()
+        # 3250m * 1250050 minor/km * 1.20 = 4875195 exactly
+        self.assertEqual(result["quotes"][0]["price_minor"], 4875195)
+        self.assertEqual(result["quotes"][0]["price"], 48752)
+        self.assertEqual(result["distance_source"], "neshan")
+        warm.delay.assert_not_called()
+
+    @mock.patch("apps.trip_app.services.pricing.warm_route_distances_celery")
+    def test_surge_is_applied_in_permille(self, warm):
+        cache.set(
+            self.keys[0], {"distance_m": 3250, "duration_s": 600, "source": "neshan"}
+        )
+        self.surge.return_value = 1250
+        result = self.quote()
+        # 4875195 * 1.25 = 6093993.75
+        self.assertEqual(result["quotes"][0]["price_minor"], 6093994)
+        self.assertEqual(result["surge"], 1.25)
+
+    @mock.patch("base.utils.neshan.distance_matrix")
+    @mock.patch("apps.trip_app.services.pricing.warm_route_distances_celery")
+    def test_miss_answers_from_estimate_and_warms_once(self, warm, distance_matrix):
+        for _ in range(3):
+            result = self.quote()
+            self.assertEqual(result["distance_source"], "estimate")
+        # the request never waits on neshan
+        distance_matrix.assert_not_called()
+        warm.delay.assert_called_once_with([(self.origin, self.destination)])
+
+    @mock.patch("base.utils.neshan.distance_matrix")
+    def test_warmup_task_fills_the_cache(self, distance_matrix):
+        distance_matrix.return_value = {
+            "rows": [
+                {
+                    "elements": [
+                        {
+                            "status": "Ok",
+                            "distance": {"value": 4100},
+                            "duration": {"value": 720},
+                        }
+                    ]
+                }
+            ]
+        }
+        warm_route_distances_celery([[self.origin, self.destination]])
+        with mock.patch(
+            "apps.trip_app.services.pricing.warm_route_distances_celery"
+        ) as warm:
+            result = self.quote()
+        self.assertEqual(result["distance_source"], "neshan")
+        self.assertEqual(result["distance_km"], 4.1)
+        warm.delay.assert_not_called()
@@ -2,6 +2,9 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from base.utils.http_client import aclose_clients
+from base.utils.redis_conn import aclose_redis
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "base.settings")
 
 django_application = get_asgi_application()
@@ -16,6 +19,8 @@ async def application(scope, receive, send):
                 await send({"type": "lifespan.startup.complete"})
             elif message["type"] == "lifespan.shutdown":
                 # print("❌ Django ASGI shutdown event received")
+                await aclose_clients()
+                await aclose_redis()
                 await send({"type": "lifespan.shutdown.complete"})
                 return
     else:
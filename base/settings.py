@@ -185,6 +185,19 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    # orjson is optional, without it these are drf's json renderer and parser
+    # mobile clients can ask for msgpack with Accept / Content-Type: application/msgpack
+    "DEFAULT_RENDERER_CLASSES": (
+        "apis.utils.renderers.ORJSONRenderer",
+        "apis.utils.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "apis.utils.parsers.ORJSONParser",
+        "apis.utils.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_RATES": {
         "otp": "1/minute",  # TODO, bug fix send otp every 2minute
@@ -467,6 +480,26 @@ if USE_CELERY:
             Exchange("notifications", type="direct"),
             routing_key="notifications",
         ),
+        Queue(
+            "locations",
+            Exchange("locations", type="direct"),
+            routing_key="locations",
+        ),
+        Queue(
+            "dispatch",
+            Exchange("dispatch", type="direct"),
+            routing_key="dispatch",
+        ),
+        Queue(
+            "pricing",
+            Exchange("pricing", type="direct"),
+            routing_key="pricing",
+        ),
+        Queue(
+            "outbox",
+            Exchange("outbox", type="direct"),
+            routing_key="outbox",
+        ),
     )
     CELERY_TASK_ROUTES = {
         "apps.auth_app.tasks.send_otp_sms_celery": {
@@ -477,6 +510,67 @@ if USE_CELERY:
             "queue": "notifications",
             "routing_key": "notifications",
         },
+        "apps.auth_app.tasks.flush_notifications_celery": {
+            "queue": "notifications",
+            "routing_key": "notifications",
+        },
+        "apps.trip_app.tasks.flush_driver_locations_celery": {
+            "queue": "locations",
+            "routing_key": "locations",
+        },
+        "apps.trip_app.tasks.dispatch_trip_celery": {
+            "queue": "dispatch",
+            "routing_key": "dispatch",
+        },
+        "apps.trip_app.tasks.sweep_dispatch_celery": {
+            "queue": "dispatch",
+            "routing_key": "dispatch",
+        },
+        "apps.trip_app.tasks.trip_status_changed_celery": {
+            "queue": "dispatch",
+            "routing_key": "dispatch",
+        },
+        "apps.trip_app.tasks.trip_accepted_celery": {
+            "queue": "dispatch",
+            "routing_key": "dispatch",
+        },
+        "apps.core_app.tasks.relay_outbox_celery": {
+            "queue": "outbox",
+            "routing_key": "outbox",
+        },
+        "apps.trip_app.tasks.compute_surge_celery": {
+            "queue": "pricing",
+            "routing_key": "pricing",
+        },
+        "apps.trip_app.tasks.warm_route_distances_celery": {
+            "queue": "pricing",
+            "routing_key": "pricing",
+        },
+    }
+
+    # celery beat
+    CELERY_BEAT_SCHEDULE = {
+        "flush_driver_locations": {
+            "task": "apps.trip_app.tasks.flush_driver_locations_celery",
+            "schedule": config("DRIVER_LOCATION_FLUSH_INTERVAL", cast=int, default=30),
+        },
+        "sweep_dispatch": {
+            "task": "apps.trip_app.tasks.sweep_dispatch_celery",
+            "schedule": config("DISPATCH_SWEEP_INTERVAL", cast=int, default=5),
+        },
+        "compute_surge": {
+            "task": "apps.trip_app.tasks.compute_surge_celery",
+            "schedule": config("SURGE_INTERVAL", cast=int, default=30),
+        },
+        "flush_notifications": {
+            "task": "apps.auth_app.tasks.flush_notifications_celery",
+            "schedule": config("NOTIFICATION_FLUSH_INTERVAL", cast=int, default=5),
+        },
+        # fallback, the relay_outbox command is the low latency relay
+        "relay_outbox": {
+            "task": "apps.core_app.tasks.relay_outbox_celery",
+            "schedule": config("OUTBOX_RELAY_INTERVAL", cast=float, default=1.0),
+        },
     }
 
 # use email
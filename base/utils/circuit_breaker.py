@@ -0,0 +1,216 @@
+import functools
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from decouple import config
+from django.core.cache import cache
+
+from apis.utils.custom_exceptions import (
+    ServiceUnavailableException,
+    TimeOutException,
+    ConnectionErrorException,
+    NetworkErrorException,
+    UpstreamServerErrorException,
+)
+from base.utils.metrics import incr_counter, get_counters
+
+CIRCUIT_FAILURE_THRESHOLD = config(
+    "CIRCUIT_FAILURE_THRESHOLD", cast=int, default=5
+)  # failures inside the window that open the circuit
+CIRCUIT_FAILURE_WINDOW = config("CIRCUIT_FAILURE_WINDOW", cast=int, default=30)
+CIRCUIT_RESET_TIMEOUT = config(
+    "CIRCUIT_RESET_TIMEOUT", cast=int, default=30
+)  # seconds the circuit stays open before probing
+CIRCUIT_STATE_REFRESH = 1.0  # seconds a worker trusts its local copy of the state
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# errors that mean the provider is unhealthy, not that the request was bad
+FAILURE_EXCEPTIONS = (
+    TimeOutException,
+    ConnectionErrorException,
+    NetworkErrorException,
+    UpstreamServerErrorException,
+)
+
+
+class CircuitBreaker:
+    """
+    circuit breaker مشترک بین ورکرها (وضعیت در redis)
+    closed --> درخواست‌ها عبور می‌کنند
+    open --> درخواست‌ها بدون انتظار رد می‌شوند
+    half_open --> یک probe در پس‌زمینه سلامت سرویس را بررسی می‌کند
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        failure_window=CIRCUIT_FAILURE_WINDOW,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT,
+        probe=None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._checked_at = 0.0
+
+    def _key(self, suffix):
+        return f"circuit:{self.name}:{suffix}"
+
+    def _read_state(self):
+        open_key, tripped_key = self._key("open"), self._key("tripped")
+        failures_key = self._key("failures")
+        values = cache.get_many([open_key, tripped_key, failures_key])
+        if open_key in values:
+            self._state = OPEN
+        elif tripped_key in values:
+            self._state = HALF_OPEN
+        else:
+            self._state = CLOSED
+        self._opened_at = values.get(tripped_key)
+        self._failures = values.get(failures_key) or 0
+        self._checked_at = time.monotonic()
+
+    def state(self, refresh=False):
+        if refresh or time.monotonic() - self._checked_at > CIRCUIT_STATE_REFRESH:
+            self._read_state()
+        return self._state
+
+    def allow(self):
+        state = self.state()
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+
+        # half open, only one worker probes the provider
+        if not cache.add(self._key("probe"), 1, timeout=self.reset_timeout):
+            return False
+        if self.probe is None:
+            # no probe function, this request is the trial call
+            return True
+        threading.Thread(target=self._run_probe, daemon=True).start()
+        return False
+
+    def _run_probe(self):
+        try:
+            self.probe()
+        except Exception as e:
+            logging.warning("circuit %s probe failed", self.name, exc_info=e)
+            self._open()
+        else:
+            self.record_success()
+        finally:
+            cache.delete(self._key("probe"))
+
+    def _open(self):
+        now = time.time()
+        cache.set(self._key("open"), now, timeout=self.reset_timeout)
+        cache.set(self._key("tripped"), now, timeout=None)
+        cache.delete(self._key("failures"))
+        self._state, self._failures, self._opened_at = OPEN, 0, now
+        self._checked_at = time.monotonic()
+        incr_counter(self._key("opened"))
+        logging.error("circuit %s opened", self.name)
+
+    def record_failure(self):
+        failures_key = self._key("failures")
+        if cache.add(failures_key, 1, timeout=self.failure_window):
+            failures = 1
+        else:
+            try:
+                failures = cache.incr(failures_key)
+            except ValueError:
+                # the window expired between add and incr, start a new one
+                cache.set(failures_key, 1, timeout=self.failure_window)
+                failures = 1
+        self._failures = failures
+
+        if self._state == HALF_OPEN or failures >= self.failure_threshold:
+            self._open()
+
+    def record_success(self):
+        if self._state == CLOSED and not self._failures:
+            return
+        cache.delete_many(
+            [self._key("open"), self._key("tripped"), self._key("failures")]
+        )
+        self._state, self._failures, self._opened_at = CLOSED, 0, None
+        self._checked_at = time.monotonic()
+
+    def snapshot(self):
+        return {
+            "state": self.state(refresh=True),
+            "failures": self._failures,
+            "opened_at": self._opened_at,
+            "opened_count": get_counters(self._key("opened"))[self._key("opened")],
+        }
+
+
+_breakers = {}
+
+
+def get_breaker(name, **kwargs):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+    return breaker
+
+
+def breakers_snapshot():
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def circuit_breaker(name):
+    """
+    باید بیرون از request_error قرار بگیرد تا خطاهای httpx تبدیل شده باشند
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            breaker = get_breaker(name)
+            if not breaker.allow():
+                raise ServiceUnavailableException()
+            try:
+                result = func(*args, **kwargs)
+            except FAILURE_EXCEPTIONS:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def a_circuit_breaker(name):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            breaker = get_breaker(name)
+            if not await sync_to_async(breaker.allow, thread_sensitive=False)():
+                raise ServiceUnavailableException()
+            try:
+                result = await func(*args, **kwargs)
+            except FAILURE_EXCEPTIONS:
+                await sync_to_async(breaker.record_failure, thread_sensitive=False)()
+                raise
+            await sync_to_async(breaker.record_success, thread_sensitive=False)()
+            return result
+
+        return wrapper
+
+    return decorator
@@ -5,9 +5,18 @@ from apis.utils.custom_exceptions import (
     ConnectionErrorException,
     NetworkErrorException,
     HttpStatusException,
+    UpstreamServerErrorException,
 )
 
 
+def raise_for_server_error(response):
+    """
+    فقط 5xx خطا حساب می‌شود، پاسخ 4xx مثل قبل به فراخواننده برمی‌گردد
+    """
+    if response.is_server_error:
+        response.raise_for_status()
+
+
 def request_error(func):
     def wrapper(*args, **kwargs):
         try:
@@ -18,6 +27,8 @@ def request_error(func):
             raise ConnectionErrorException()
         except httpx.NetworkError:
             raise NetworkErrorException()
+        except httpx.HTTPStatusError:
+            raise UpstreamServerErrorException()
         except Exception as e:
             raise HttpStatusException(detail=str(e))
 
@@ -34,6 +45,8 @@ def a_request_error(func):
             raise ConnectionErrorException()
         except httpx.NetworkError:
             raise NetworkErrorException()
+        except httpx.HTTPStatusError:
+            raise UpstreamServerErrorException()
         except Exception as e:
             raise HttpStatusException(detail=str(e))
 
@@ -0,0 +1,186 @@
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from pathlib import Path
+
+from decouple import config
+
+from base.utils.geo import EARTH_RADIUS_KM
+
+GAZETTEER_PATH = config(
+    "GAZETTEER_PATH",
+    cast=str,
+    default=str(Path(__file__).resolve().parent.parent.parent / "data/gazetteer.bin"),
+)
+GAZETTEER_MAX_DISTANCE_M = config(
+    "GAZETTEER_MAX_DISTANCE_M", cast=int, default=1500
+)  # farther matches are not a useful address
+
+MAGIC = b"SGZ1"
+# magic, point count, names blob size
+HEADER = struct.Struct("<4sIQ")
+FIELD_SEPARATOR = "\x1f"
+
+
+def _build_kd_order(points, lo, hi, depth):
+    """
+    ترتیب ذخیره kd-tree ضمنی: میانه هر بازه در وسط همان بازه قرار می‌گیرد
+    """
+    if lo >= hi:
+        return
+    axis = depth % 2
+    points[lo:hi] = sorted(points[lo:hi], key=lambda p: p[axis])
+    mid = (lo + hi) // 2
+    _build_kd_order(points, lo, mid, depth + 1)
+    _build_kd_order(points, mid + 1, hi, depth + 1)
+
+
+def build_index(rows, output_path):
+    """
+    rows = [(lat, lng, name, city, neighbourhood), ...]
+    خروجی یک فایل باینری فشرده که با mmap بین ورکرها به اشتراک گذاشته می‌شود
+    """
+    points = list(rows)
+    _build_kd_order(points, 0, len(points), 0)
+
+    lats = array("d", (p[0] for p in points))
+    lngs = array("d", (p[1] for p in points))
+    offsets = array("Q", [0])
+    names = bytearray()
+    for point in points:
+        names += FIELD_SEPARATOR.join(point[2:]).encode()
+        offsets.append(len(names))
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(points), len(names)))
+        f.write(lats.tobytes())
+        f.write(lngs.tobytes())
+        f.write(offsets.tobytes())
+        f.write(names)
+    # atomic swap, running workers keep their old mapping
+    os.replace(tmp_path, output_path)
+    return len(points)
+
+
+class Gazetteer:
+    """
+    جستجوی نزدیک‌ترین خیابان/محله به صورت آفلاین روی kd-tree نگاشت شده در حافظه
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer index")
+
+        view = memoryview(self._mmap)
+        start = HEADER.size
+        size = self.count * 8
+        self._lats = view[start : start + size].cast("d")
+        self._lngs = view[start + size : start + 2 * size].cast("d")
+        start += 2 * size
+        self._offsets = view[start : start + (self.count + 1) * 8].cast("Q")
+        self._names_start = start + (self.count + 1) * 8
+
+    def _fields(self, index):
+        start = self._names_start + self._offsets[index]
+        end = self._names_start + self._offsets[index + 1]
+        return self._mmap[start:end].decode().split(FIELD_SEPARATOR)
+
+    def nearest(self, lat, lng):
+        """
+        :return: (index, distance_km) یا None اگر ایندکس خالی باشد
+        """
+        if not self.count:
+            return None
+        lat, lng = float(lat), float(lng)
+        # equirectangular projection around the query point, in degrees
+        lng_scale = math.cos(math.radians(lat))
+        lats, lngs = self._lats, self._lngs
+        best = [-1, math.inf]
+
+        def search(lo, hi, depth):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            d_lat = lats[mid] - lat
+            d_lng = (lngs[mid] - lng) * lng_scale
+            dist = d_lat * d_lat + d_lng * d_lng
+            if dist < best[1]:
+                best[0], best[1] = mid, dist
+
+            diff = d_lat if depth % 2 == 0 else d_lng
+            if diff > 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            search(near[0], near[1], depth + 1)
+            if diff * diff < best[1]:
+                search(far[0], far[1], depth + 1)
+
+        search(0, self.count, 0)
+        distance_km = math.radians(math.sqrt(best[1])) * EARTH_RADIUS_KM
+        return best[0], distance_km
+
+    def reverse_geocode(self, lat, lng, max_distance_m=GAZETTEER_MAX_DISTANCE_M):
+        """
+        خروجی هم شکل پاسخ نشان (formatted_address) با source=offline
+        """
+        match = self.nearest(lat, lng)
+        if match is None:
+            return None
+        index, distance_km = match
+        distance_m = distance_km * 1000
+        if distance_m > max_distance_m:
+            return None
+
+        name, city, neighbourhood = (self._fields(index) + ["", ""])[:3]
+        return {
+            "status": "OK",
+            "formatted_address": "، ".join(p for p in (city, neighbourhood, name) if p),
+            "route_name": name,
+            "city": city or None,
+            "neighbourhood": neighbourhood or None,
+            "distance_m": round(distance_m),
+            "source": "offline",
+        }
+
+
+_lock = threading.Lock()
+_gazetteer = None
+_gazetteer_key = None
+
+
+def get_gazetteer():
+    """
+    ایندکس یکبار در هر پروسه باز می‌شود، صفحات فایل بین ورکرها مشترک هستند
+    اگر فایل دوباره ساخته شود نسخه جدید باز می‌شود
+    """
+    global _gazetteer, _gazetteer_key
+    try:
+        stat = os.stat(GAZETTEER_PATH)
+    except FileNotFoundError:
+        return None
+
+    key = (os.getpid(), stat.st_ino, stat.st_mtime_ns)
+    if _gazetteer_key != key:
+        with _lock:
+            if _gazetteer_key != key:
+                _gazetteer = Gazetteer(GAZETTEER_PATH)
+                _gazetteer_key = key
+    return _gazetteer
+
+
+def offline_reverse_geocode(lat, lng):
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    return gazetteer.reverse_geocode(lat, lng)
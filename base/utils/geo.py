@@ -0,0 +1,81 @@
+import math
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(lat, lng, precision=8):
+    """
+    تبدیل مختصات به geohash
+    precision 7 --> ~150m, precision 8 --> ~38m, precision 9 --> ~5m
+    """
+    lat, lng = float(lat), float(lng)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def geohash_decode(geohash):
+    """
+    مرکز سلول geohash --> (lat, lng)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if bit:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    فاصله مستقیم دو نقطه روی کره زمین (کیلومتر)
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    d_lat = lat2 - lat1
+    d_lng = lng2 - lng1
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin(d_lng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
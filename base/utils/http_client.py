@@ -0,0 +1,120 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+import httpx
+from decouple import config
+
+# http/2 needs "h2" (declared as httpx[http2]), otherwise http/1.1 is used
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+PROVIDERS = {
+    "neshan": {
+        "base_url": "https://api.neshan.org",
+        "http2": config("NESHAN_HTTP2", cast=bool, default=True),
+        "max_connections": config("NESHAN_MAX_CONNECTIONS", cast=int, default=20),
+        "max_keepalive_connections": config(
+            "NESHAN_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=10
+        ),
+        "keepalive_expiry": config("NESHAN_KEEPALIVE_EXPIRY", cast=int, default=60),
+        "timeout": config("NESHAN_TIMEOUT", cast=int, default=15),
+        "connect_timeout": config("NESHAN_CONNECT_TIMEOUT", cast=int, default=3),
+    },
+    "sorna": {
+        "base_url": "http://sornasms.net",
+        "http2": False,  # plain http, no h2c support
+        "max_connections": config("SORNA_MAX_CONNECTIONS", cast=int, default=10),
+        "max_keepalive_connections": config(
+            "SORNA_MAX_KEEPALIVE_CONNECTIONS", cast=int, default=5
+        ),
+        "keepalive_expiry": config("SORNA_KEEPALIVE_EXPIRY", cast=int, default=60),
+        "timeout": config("SORNA_TIMEOUT", cast=int, default=10),
+        "connect_timeout": config("SORNA_CONNECT_TIMEOUT", cast=int, default=3),
+    },
+}
+
+_lock = threading.Lock()
+_clients = {}
+_clients_pid = os.getpid()
+# AsyncClient is bound to the event loop that created it
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_kwargs(provider):
+    conf = PROVIDERS[provider]
+    return {
+        "base_url": conf["base_url"],
+        "http2": conf["http2"] and HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=conf["max_connections"],
+            max_keepalive_connections=conf["max_keepalive_connections"],
+            keepalive_expiry=conf["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(conf["timeout"], connect=conf["connect_timeout"]),
+    }
+
+
+def _reset_after_fork():
+    """
+    کانکشن‌های باز پروسه والد نباید در فرزند استفاده شوند
+    (gunicorn preload_app و celery prefork)
+    """
+    global _lock, _clients, _clients_pid, _async_clients
+    _lock = threading.Lock()
+    _clients = {}
+    _clients_pid = os.getpid()
+    _async_clients = weakref.WeakKeyDictionary()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(provider):
+    """
+    کلاینت http مشترک و با connection pool برای هر provider در هر پروسه
+    """
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(provider)
+    if client is not None and not client.is_closed:
+        return client
+
+    with _lock:
+        client = _clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.Client(**_client_kwargs(provider))
+            _clients[provider] = client
+        return client
+
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def get_async_client(provider):
+    """
+    نسخه async کلاینت مشترک، یک کلاینت برای هر provider در هر event loop
+    """
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    loop = asyncio.get_running_loop()
+    loop_clients = _async_clients.setdefault(loop, {})
+    client = loop_clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_kwargs(provider))
+        loop_clients[provider] = client
+    return client
+
+
+async def aclose_clients():
+    loop = asyncio.get_running_loop()
+    loop_clients = _async_clients.pop(loop, {})
+    for client in loop_clients.values():
+        await client.aclose()
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+
+COUNTER_PREFIX = "metrics"
+
+
+def counter_key(name):
+    return f"{COUNTER_PREFIX}:{name}"
+
+
+def incr_counter(name, delta=1):
+    """
+    شمارنده مشترک بین همه ورکرها (redis)
+    """
+    key = counter_key(name)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # key does not exist yet
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+async def a_incr_counter(name, delta=1):
+    key = counter_key(name)
+    try:
+        return await cache.aincr(key, delta)
+    except ValueError:
+        if await cache.aadd(key, delta, timeout=None):
+            return delta
+        return await cache.aincr(key, delta)
+
+
+def get_counters(*names):
+    values = cache.get_many([counter_key(name) for name in names])
+    return {name: values.get(counter_key(name), 0) or 0 for name in names}
+
+
+def hit_ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
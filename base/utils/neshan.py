@@ -1,18 +1,81 @@
+import asyncio
+import hashlib
 import json
 
 import httpx
 from decouple import config
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
 
-from base.utils.custom_exceptions import request_error
-
+from apis.utils.custom_exceptions import (
+    ServiceUnavailableException,
+    HttpStatusException,
+)
+from base.utils.circuit_breaker import (
+    FAILURE_EXCEPTIONS,
+    circuit_breaker,
+    a_circuit_breaker,
+    get_breaker,
+)
+from base.utils.custom_exceptions import (
+    request_error,
+    a_request_error,
+    raise_for_server_error,
+)
+from base.utils.gazetteer import offline_reverse_geocode
+from base.utils.geo import geohash_encode, haversine_km
+from base.utils.http_client import PROVIDERS, get_client, get_async_client
+from base.utils.metrics import incr_counter, a_incr_counter, get_counters, hit_ratio
+from base.utils.single_flight import single_flight, a_single_flight
 
 NESHAN_SERVICE_API_KEY = config("NESHAN_SERVICE_API_KEY", cast=str)
 REVERSE_GEOCODE_TIMEOUT = config("REVERSE_GEOCODE_TIMEOUT", cast=int, default=15)
 
+# reverse geocode cache
+REVERSE_GEOCODE_CACHE_PRECISION = config(
+    "REVERSE_GEOCODE_CACHE_PRECISION", cast=int, default=8
+)  # geohash precision, 8 --> cells of ~38m x 19m
+REVERSE_GEOCODE_CACHE_TIMEOUT = config(
+    "REVERSE_GEOCODE_CACHE_TIMEOUT", cast=int, default=604800
+)  # seconds, addresses rarely change
+REVERSE_GEOCODE_CACHE_PREFIX = "neshan:reverse"
+REVERSE_GEOCODE_STALE_TIMEOUT = config(
+    "REVERSE_GEOCODE_STALE_TIMEOUT", cast=int, default=2592000
+)  # seconds a last known answer is kept for when neshan is down
+REVERSE_GEOCODE_STALE_PREFIX = "neshan:reverse:stale"
+NESHAN_PROBE_POINT = (35.6997, 51.3380)  # azadi square, used to probe recovery
+REVERSE_GEOCODE_BATCH_CONCURRENCY = config(
+    "REVERSE_GEOCODE_BATCH_CONCURRENCY", cast=int, default=8
+)  # max in-flight neshan calls per batch request
 
-@request_error
-def calc_address_to_x_y(address, state_name, city_name, location: dict[str, float]):
-    url = "https://api.neshan.org/geocoding/v1"
+# distance matrix
+DISTANCE_MATRIX_TIMEOUT = config("DISTANCE_MATRIX_TIMEOUT", cast=int, default=3)
+DISTANCE_MATRIX_MAX_POINTS = config(
+    "DISTANCE_MATRIX_MAX_POINTS", cast=int, default=10
+)  # origins (and destinations) per upstream call
+DISTANCE_MATRIX_CACHE_PRECISION = config(
+    "DISTANCE_MATRIX_CACHE_PRECISION", cast=int, default=7
+)  # geohash precision, 7 --> cells of ~150m
+DISTANCE_MATRIX_CACHE_TIMEOUT = config(
+    "DISTANCE_MATRIX_CACHE_TIMEOUT", cast=int, default=86400
+)
+DISTANCE_MATRIX_CACHE_PREFIX = "neshan:distance"
+DISTANCE_MATRIX_WARMUP_TIMEOUT = config(
+    "DISTANCE_MATRIX_WARMUP_TIMEOUT", cast=int, default=60
+)  # seconds before the same missing pair is queued for warmup again
+DETOUR_FACTOR = config(
+    "DETOUR_FACTOR", cast=float, default=1.3
+)  # road distance / straight line distance in the city
+ESTIMATE_SPEED_KMH = config("ESTIMATE_SPEED_KMH", cast=float, default=25)
+
+
+def _request_timeout(seconds):
+    # a bare number would also replace the client's short connect timeout
+    return httpx.Timeout(seconds, connect=PROVIDERS["neshan"]["connect_timeout"])
+
+
+def _geocode_request(address, state_name, city_name, location):
+    url = "/geocoding/v1"
     headers = {
         "Api-Key": NESHAN_SERVICE_API_KEY,
         "Content-Type": "application/json",
@@ -24,11 +87,88 @@ def calc_address_to_x_y(address, state_name, city_name, location: dict[str, floa
         "location": location,
     }
     json_string = json.dumps(request_data, ensure_ascii=False)
+    return {"url": url, "params": json_string, "headers": headers}
+
+
+def _reverse_geocode_request(lat, lng):
+    if not lat or not lng:
+        raise ValueError("lat and lng are required")
+    url = "/v5/reverse"
+    headers = {
+        "Api-Key": NESHAN_SERVICE_API_KEY,
+    }
+    params = {
+        "lat": lat,
+        "lng": lng,
+    }
+    return {
+        "url": url,
+        "params": params,
+        "headers": headers,
+        "timeout": _request_timeout(REVERSE_GEOCODE_TIMEOUT),
+    }
+
+
+def _distance_matrix_request(origins, destinations):
+    url = "/v1/distance-matrix"
+    headers = {
+        "Api-Key": NESHAN_SERVICE_API_KEY,
+    }
+    params = {
+        "type": "car",
+        "origins": "|".join(f"{lat},{lng}" for lat, lng in origins),
+        "destinations": "|".join(f"{lat},{lng}" for lat, lng in destinations),
+    }
+    return {
+        "url": url,
+        "params": params,
+        "headers": headers,
+        "timeout": _request_timeout(DISTANCE_MATRIX_TIMEOUT),
+    }
 
-    response = httpx.get(url, params=json_string, headers=headers)
+
+def _geocode_flight_key(request_kwargs):
+    digest = hashlib.sha1(request_kwargs["params"].encode()).hexdigest()
+    return f"neshan:geocode:{digest}"
+
+
+@circuit_breaker("neshan")
+@request_error
+def _calc_address_to_x_y(request_kwargs):
+    response = get_client("neshan").get(**request_kwargs)
+    raise_for_server_error(response)
     return response.json()
 
 
+@a_circuit_breaker("neshan")
+@a_request_error
+async def _a_calc_address_to_x_y(request_kwargs):
+    response = await get_async_client("neshan").get(**request_kwargs)
+    raise_for_server_error(response)
+    return response.json()
+
+
+def calc_address_to_x_y(address, state_name, city_name, location: dict[str, float]):
+    """
+    تبدیل ادرس به مختصات
+    درخواست‌های همزمان یکسان فقط یکبار به نشان ارسال می‌شوند
+    """
+    request_kwargs = _geocode_request(address, state_name, city_name, location)
+    return single_flight(
+        _geocode_flight_key(request_kwargs), _calc_address_to_x_y, request_kwargs
+    )
+
+
+async def a_calc_address_to_x_y(
+    address, state_name, city_name, location: dict[str, float]
+):
+    request_kwargs = _geocode_request(address, state_name, city_name, location)
+    return await a_single_flight(
+        _geocode_flight_key(request_kwargs), _a_calc_address_to_x_y, request_kwargs
+    )
+
+
+@circuit_breaker("neshan")
 @request_error
 def reverse_geocode(lat, lng):
     """
@@ -37,17 +177,379 @@ def reverse_geocode(lat, lng):
     lng = طول جغرافیایی
     :return:
     """
+    request_kwargs = _reverse_geocode_request(lat, lng)
+    response = get_client("neshan").get(**request_kwargs)
+    raise_for_server_error(response)
+    return response.json()
+
+
+@a_circuit_breaker("neshan")
+@a_request_error
+async def a_reverse_geocode(lat, lng):
+    """
+    نسخه async تبدیل مختصات به ادرس
+    """
+    request_kwargs = _reverse_geocode_request(lat, lng)
+    response = await get_async_client("neshan").get(**request_kwargs)
+    raise_for_server_error(response)
+    return response.json()
+
+
+# the probe bypasses the breaker itself
+get_breaker("neshan", probe=lambda: reverse_geocode.__wrapped__(*NESHAN_PROBE_POINT))
+
+# neshan is unavailable, answer from the last known result if there is one
+STALE_EXCEPTIONS = (ServiceUnavailableException, *FAILURE_EXCEPTIONS)
+
+
+def reverse_geocode_cache_key(lat, lng):
+    cell = geohash_encode(lat, lng, REVERSE_GEOCODE_CACHE_PRECISION)
+    return f"{REVERSE_GEOCODE_CACHE_PREFIX}:{cell}"
+
+
+def _stale_key(cache_key):
+    return cache_key.replace(
+        REVERSE_GEOCODE_CACHE_PREFIX, REVERSE_GEOCODE_STALE_PREFIX, 1
+    )
+
+
+def _cache_reverse_geocode(cache_key, result):
+    cache.set(cache_key, result, timeout=REVERSE_GEOCODE_CACHE_TIMEOUT)
+    cache.set(_stale_key(cache_key), result, timeout=REVERSE_GEOCODE_STALE_TIMEOUT)
+
+
+def cached_reverse_geocode(lat, lng):
+    """
+    reverse_geocode با کش redis
+    مختصات به سلول geohash گرد می‌شوند تا پین‌های نزدیک به هم از یک کش استفاده کنند
+    """
     if not lat or not lng:
         raise ValueError("lat and lng are required")
-    url = "https://api.neshan.org/v5/reverse"
-    headers = {
-        "Api-Key": NESHAN_SERVICE_API_KEY,
+
+    cache_key = reverse_geocode_cache_key(lat, lng)
+    result = cache.get(cache_key)
+    if result is not None:
+        incr_counter("neshan:reverse:hit")
+        return result
+
+    incr_counter("neshan:reverse:miss")
+    try:
+        # concurrent misses for the same cell share one neshan call
+        result = single_flight(cache_key, _fetch_reverse_geocode, cache_key, lat, lng)
+    except STALE_EXCEPTIONS:
+        stale = cache.get(_stale_key(cache_key))
+        if stale is not None:
+            incr_counter("neshan:reverse:stale")
+            return stale
+        offline = _offline_reverse_geocode(lat, lng)
+        if offline is None:
+            raise
+        return offline
+
+    if _is_ok(result):
+        return result
+    # neshan answered with an error (e.g. over quota)
+    return _offline_reverse_geocode(lat, lng) or result
+
+
+def _is_ok(result):
+    return isinstance(result, dict) and result.get("status") == "OK"
+
+
+def _offline_reverse_geocode(lat, lng):
+    result = offline_reverse_geocode(lat, lng)
+    if result is not None:
+        incr_counter("neshan:reverse:offline")
+    return result
+
+
+def _fetch_reverse_geocode(cache_key, lat, lng):
+    result = reverse_geocode(lat, lng)
+    # only successful answers are cached
+    if _is_ok(result):
+        _cache_reverse_geocode(cache_key, result)
+    return result
+
+
+async def a_cached_reverse_geocode(lat, lng):
+    """
+    نسخه async cached_reverse_geocode
+    """
+    if not lat or not lng:
+        raise ValueError("lat and lng are required")
+
+    cache_key = reverse_geocode_cache_key(lat, lng)
+    result = await cache.aget(cache_key)
+    if result is not None:
+        await a_incr_counter("neshan:reverse:hit")
+        return result
+
+    await a_incr_counter("neshan:reverse:miss")
+    try:
+        result = await a_single_flight(
+            cache_key, _a_fetch_reverse_geocode, cache_key, lat, lng
+        )
+    except STALE_EXCEPTIONS:
+        stale = await cache.aget(_stale_key(cache_key))
+        if stale is not None:
+            await a_incr_counter("neshan:reverse:stale")
+            return stale
+        offline = await _a_offline_reverse_geocode(lat, lng)
+        if offline is None:
+            raise
+        return offline
+
+    if _is_ok(result):
+        return result
+    return await _a_offline_reverse_geocode(lat, lng) or result
+
+
+async def _a_offline_reverse_geocode(lat, lng):
+    # in-memory index lookup, no io
+    result = offline_reverse_geocode(lat, lng)
+    if result is not None:
+        await a_incr_counter("neshan:reverse:offline")
+    return result
+
+
+async def _a_fetch_reverse_geocode(cache_key, lat, lng):
+    result = await a_reverse_geocode(lat, lng)
+    if _is_ok(result):
+        await cache.aset(cache_key, result, timeout=REVERSE_GEOCODE_CACHE_TIMEOUT)
+        await cache.aset(
+            _stale_key(cache_key), result, timeout=REVERSE_GEOCODE_STALE_TIMEOUT
+        )
+    return result
+
+
+async def a_batch_reverse_geocode(points, concurrency=None):
+    """
+    تبدیل دسته‌ای مختصات به ادرس
+    points = [(lat, lng), ...]
+    نقاط تکراری (هم سلول) یکبار درخواست می‌شوند، کش‌ها بلافاصله برگردانده می‌شوند
+    و بقیه همزمان (با سقف concurrency) از نشان گرفته می‌شوند
+    """
+    concurrency = concurrency or REVERSE_GEOCODE_BATCH_CONCURRENCY
+    keys = [reverse_geocode_cache_key(lat, lng) for lat, lng in points]
+
+    # dedupe by cache cell, first point of each cell is sent upstream
+    unique = {}
+    for key, point in zip(keys, points):
+        unique.setdefault(key, point)
+
+    results = await cache.aget_many(list(unique))
+    errors = {}
+    misses = [key for key in unique if key not in results]
+    if results:
+        await a_incr_counter("neshan:reverse:hit", len(results))
+    if misses:
+        await a_incr_counter("neshan:reverse:miss", len(misses))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(key):
+        lat, lng = unique[key]
+        async with semaphore:
+            try:
+                result = await a_single_flight(key, a_reverse_geocode, lat, lng)
+                return key, result, None
+            except APIException as e:
+                return key, None, str(e.detail)
+
+    to_cache = {}
+    for key, result, error in await asyncio.gather(*(fetch(key) for key in misses)):
+        if error is not None:
+            errors[key] = error
+            continue
+        results[key] = result
+        if _is_ok(result):
+            to_cache[key] = result
+    if to_cache:
+        await cache.aset_many(to_cache, timeout=REVERSE_GEOCODE_CACHE_TIMEOUT)
+        await cache.aset_many(
+            {_stale_key(key): result for key, result in to_cache.items()},
+            timeout=REVERSE_GEOCODE_STALE_TIMEOUT,
+        )
+
+    # failed cells fall back to their last known answer, then the offline index
+    if errors:
+        stale = await cache.aget_many([_stale_key(key) for key in errors])
+        for key in list(errors):
+            if _stale_key(key) in stale:
+                results[key] = stale[_stale_key(key)]
+                del errors[key]
+                continue
+            offline = await _a_offline_reverse_geocode(*unique[key])
+            if offline is not None:
+                results[key] = offline
+                del errors[key]
+
+    return [
+        {
+            "lat": lat,
+            "lng": lng,
+            "result": results.get(key),
+            "error": errors.get(key, False),
+        }
+        for key, (lat, lng) in zip(keys, points)
+    ]
+
+
+@circuit_breaker("neshan")
+@request_error
+def distance_matrix(origins, destinations):
+    """
+    فاصله و زمان جاده‌ای همه مبداها تا همه مقصدها در یک درخواست
+    origins, destinations = [(lat, lng), ...]
+    """
+    request_kwargs = _distance_matrix_request(origins, destinations)
+    response = get_client("neshan").get(**request_kwargs)
+    raise_for_server_error(response)
+    return response.json()
+
+
+def distance_cache_key(origin, destination):
+    precision = DISTANCE_MATRIX_CACHE_PRECISION
+    return (
+        f"{DISTANCE_MATRIX_CACHE_PREFIX}:"
+        f"{geohash_encode(*origin, precision)}:{geohash_encode(*destination, precision)}"
+    )
+
+
+def estimate_route(origin, destination):
+    """
+    تخمین محلی وقتی نشان در دسترس نیست: فاصله مستقیم ضربدر ضریب پیچ و خم مسیر
+    """
+    distance_km = haversine_km(*origin, *destination) * DETOUR_FACTOR
+    return {
+        "distance_m": round(distance_km * 1000),
+        "duration_s": round(distance_km / ESTIMATE_SPEED_KMH * 3600),
+        "source": "estimate",
     }
-    params = {
-        "lat": lat,
-        "lng": lng,
+
+
+def _matrix_batches(pairs):
+    """
+    جفت‌ها طوری دسته می‌شوند که هر دسته حداکثر DISTANCE_MATRIX_MAX_POINTS مبدا و مقصد داشته باشد
+    """
+    batch, origins, destinations = [], set(), set()
+    for key, (origin, destination) in pairs:
+        new_origins = origins | {origin}
+        new_destinations = destinations | {destination}
+        if batch and (
+            len(new_origins) > DISTANCE_MATRIX_MAX_POINTS
+            or len(new_destinations) > DISTANCE_MATRIX_MAX_POINTS
+        ):
+            yield batch
+            batch, new_origins, new_destinations = [], {origin}, {destination}
+        batch.append((key, origin, destination))
+        origins, destinations = new_origins, new_destinations
+    if batch:
+        yield batch
+
+
+def _fetch_matrix_batch(batch):
+    origins = list(dict.fromkeys(origin for _, origin, _ in batch))
+    destinations = list(dict.fromkeys(destination for _, _, destination in batch))
+    result = distance_matrix(origins, destinations)
+    rows = result.get("rows") or []
+
+    routes = {}
+    for key, origin, destination in batch:
+        try:
+            element = rows[origins.index(origin)]["elements"][
+                destinations.index(destination)
+            ]
+        except (IndexError, KeyError, TypeError):
+            continue
+        if str(element.get("status", "")).lower() != "ok":
+            continue
+        routes[key] = {
+            "distance_m": element["distance"]["value"],
+            "duration_s": element["duration"]["value"],
+            "source": "neshan",
+        }
+    return routes
+
+
+def route_distances(pairs, fetch=True):
+    """
+    فاصله جاده‌ای برای چند جفت (مبدا، مقصد) با کش سلول‌های geohash
+    pairs = [((lat, lng), (lat, lng)), ...]
+    جفت‌های بدون کش در کمترین تعداد درخواست به نشان گرفته می‌شوند
+    و اگر نشان در دسترس نباشد تخمین محلی برگردانده می‌شود (کش نمی‌شود)
+    fetch=False --> بدون درخواست به نشان، جفت‌های بدون کش فقط تخمین زده می‌شوند
+    """
+    pairs = [((float(o[0]), float(o[1])), (float(d[0]), float(d[1]))) for o, d in pairs]
+    keys = [distance_cache_key(origin, destination) for origin, destination in pairs]
+    unique = dict(zip(keys, pairs))
+
+    routes = cache.get_many(list(unique))
+    misses = [(key, unique[key]) for key in unique if key not in routes]
+    if routes:
+        incr_counter("neshan:distance:hit", len(routes))
+    if misses:
+        incr_counter("neshan:distance:miss", len(misses))
+
+    fetched = {}
+    for batch in _matrix_batches(misses if fetch else []):
+        try:
+            fetched.update(_fetch_matrix_batch(batch))
+        except (*STALE_EXCEPTIONS, HttpStatusException):
+            # the rest of the batches would most likely fail the same way
+            break
+    if fetched:
+        cache.set_many(fetched, timeout=DISTANCE_MATRIX_CACHE_TIMEOUT)
+        routes.update(fetched)
+
+    estimated = 0
+    for key, (origin, destination) in misses:
+        if key not in routes:
+            routes[key] = estimate_route(origin, destination)
+            estimated += 1
+    if estimated:
+        incr_counter("neshan:distance:estimate", estimated)
+
+    return [routes[key] for key in keys]
+
+
+def route_distance(origin, destination, fetch=True):
+    return route_distances([(origin, destination)], fetch=fetch)[0]
+
+
+def claim_route_warmup(origin, destination):
+    """
+    True فقط برای اولین درخواست، یک جفت بدون کش چند بار در صف گذاشته نمی‌شود
+    """
+    key = f"{distance_cache_key(origin, destination)}:warmup"
+    return cache.add(key, 1, timeout=DISTANCE_MATRIX_WARMUP_TIMEOUT)
+
+
+def distance_matrix_cache_stats():
+    counters = get_counters(
+        "neshan:distance:hit", "neshan:distance:miss", "neshan:distance:estimate"
+    )
+    hits, misses = counters["neshan:distance:hit"], counters["neshan:distance:miss"]
+    return {
+        "hit": hits,
+        "miss": misses,
+        "estimate": counters["neshan:distance:estimate"],
+        "hit_ratio": hit_ratio(hits, misses),
     }
-    response = httpx.get(
-        url, params=params, headers=headers, timeout=REVERSE_GEOCODE_TIMEOUT
+
+
+def reverse_geocode_cache_stats():
+    counters = get_counters(
+        "neshan:reverse:hit",
+        "neshan:reverse:miss",
+        "neshan:reverse:stale",
+        "neshan:reverse:offline",
     )
-    return response.json()
+    hits, misses = counters["neshan:reverse:hit"], counters["neshan:reverse:miss"]
+    return {
+        "hit": hits,
+        "miss": misses,
+        "stale": counters["neshan:reverse:stale"],
+        "offline": counters["neshan:reverse:offline"],
+        "hit_ratio": hit_ratio(hits, misses),
+    }
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+from decouple import config
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+APPROXIMATE_COUNT_THRESHOLD = config(
+    "APPROXIMATE_COUNT_THRESHOLD", cast=int, default=10000
+)  # planner estimates below this are replaced by an exact COUNT(*)
+APPROXIMATE_COUNT_TIMEOUT = config(
+    "APPROXIMATE_COUNT_TIMEOUT", cast=int, default=30
+)  # seconds a count is cached for the same query
+
+
+def _count_cache_key(sql, params):
+    signature = hashlib.sha1(f"{sql}:{params!r}".encode()).hexdigest()
+    return f"approximate_count:{signature}"
+
+
+def _estimate(queryset):
+    """
+    تخمین planner: بدون فیلتر از pg_class.reltuples و در غیر این صورت از EXPLAIN
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # -1 means the table was never analyzed
+            if row and row[0] >= 0:
+                return int(row[0])
+
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def approximate_count(queryset):
+    """
+    تعداد تقریبی برای جدول‌های بزرگ و دقیق برای نتایج کوچک، برای هر کوئری کوتاه مدت کش می‌شود
+    """
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    cache_key = _count_cache_key(sql, params)
+    count = cache.get(cache_key)
+    if count is None:
+        count = _estimate(queryset)
+        if count < APPROXIMATE_COUNT_THRESHOLD:
+            count = queryset.count()
+        cache.set(cache_key, count, timeout=APPROXIMATE_COUNT_TIMEOUT)
+    return count
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator جنگو با approximate_count به جای COUNT(*) (برای admin و DRF)
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return approximate_count(self.object_list)
+        return super().count
@@ -0,0 +1,39 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis import asyncio as aredis
+
+# one async connection pool per event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis(alias="default"):
+    """
+    کلاینت خام redis (بدون prefix و serializer کش جنگو) برای GEO, ZSET, LIST ...
+    """
+    return get_redis_connection(alias)
+
+
+def get_async_redis(alias="default"):
+    loop = asyncio.get_running_loop()
+    loop_clients = _async_clients.setdefault(loop, {})
+    client = loop_clients.get(alias)
+    if client is None:
+        options = settings.CACHES[alias].get("OPTIONS", {})
+        pool_kwargs = options.get("CONNECTION_POOL_KWARGS", {})
+        client = aredis.from_url(
+            settings.CACHES[alias]["LOCATION"],
+            max_connections=pool_kwargs.get("max_connections"),
+            socket_timeout=options.get("SOCKET_TIMEOUT"),
+            socket_connect_timeout=options.get("SOCKET_CONNECT_TIMEOUT"),
+        )
+        loop_clients[alias] = client
+    return client
+
+
+async def aclose_redis():
+    loop = asyncio.get_running_loop()
+    for client in _async_clients.pop(loop, {}).values():
+        await client.aclose()
@@ -1,7 +1,8 @@
-import httpx
 from decouple import config
 
+from .circuit_breaker import circuit_breaker, get_breaker
 from .custom_exceptions import request_error
+from .http_client import get_client
 
 # kavenegra
 BASE_URL = config(
@@ -39,6 +40,10 @@ SORNA_BASE_URL = config("SORNA_BASE_URL", cast=str, default="https://api.sorna.c
 #     return response.json()
 
 
+get_breaker("sorna")
+
+
+@circuit_breaker("sorna")
 @request_error
 def send_sms_sorna(phone: str, code: str):
     headers = {"Content-Type": "application/json"}
@@ -50,11 +55,10 @@ def send_sms_sorna(phone: str, code: str):
         "Mobile": phone,
         "Message": message,
     }
-    sorna_url = "http://sornasms.net/webServiceRest/ServiceSend.svc/SingleSMSEngine"
-    response = httpx.post(
+    sorna_url = "/webServiceRest/ServiceSend.svc/SingleSMSEngine"
+    response = get_client("sorna").post(
         url=sorna_url,
         json=req_body,
-        timeout=10,
         headers=headers,
     )
     return response.json()
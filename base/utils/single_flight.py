@@ -0,0 +1,161 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+from decouple import config
+from django.core.cache import cache
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = config(
+    "SINGLE_FLIGHT_LOCK_TIMEOUT", cast=int, default=20
+)  # seconds, must be longer than the slowest upstream call
+SINGLE_FLIGHT_RESULT_TIMEOUT = config(
+    "SINGLE_FLIGHT_RESULT_TIMEOUT", cast=int, default=5
+)  # seconds the shared result is kept for waiting workers
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_lock = threading.Lock()
+_calls = {}
+# asyncio futures are bound to the loop that created them
+_async_calls = weakref.WeakKeyDictionary()
+
+
+def _reset_after_fork():
+    global _lock, _calls, _async_calls
+    _lock = threading.Lock()
+    _calls = {}
+    _async_calls = weakref.WeakKeyDictionary()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _lock_key(key):
+    return f"single_flight:lock:{key}"
+
+
+def _result_key(key):
+    return f"single_flight:result:{key}"
+
+
+def _shared_call(key, func, args, kwargs):
+    """
+    بین ورکرها: فقط ورکری که قفل redis را بگیرد درخواست را می‌فرستد
+    و بقیه منتظر نتیجه او می‌مانند
+    """
+    lock_key, result_key = _lock_key(key), _result_key(key)
+    if cache.add(lock_key, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+        try:
+            result = func(*args, **kwargs)
+            cache.set(result_key, {"value": result}, SINGLE_FLIGHT_RESULT_TIMEOUT)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        shared = cache.get(result_key)
+        if shared is not None:
+            return shared["value"]
+        if not cache.get(lock_key):
+            # the leader may have stored its result right after our first read
+            shared = cache.get(result_key)
+            if shared is not None:
+                return shared["value"]
+            # leader finished without a result (error), try ourselves
+            break
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+    return func(*args, **kwargs)
+
+
+def single_flight(key, func, *args, **kwargs):
+    """
+    درخواست‌های همزمان یکسان (با key یکسان) فقط یکبار func را اجرا می‌کنند
+    و نتیجه بین همه آنها (در همین پروسه و بین ورکرها) تقسیم می‌شود
+    """
+    with _lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        call.event.wait(SINGLE_FLIGHT_LOCK_TIMEOUT)
+        if call.error is not None:
+            raise call.error
+        if call.event.is_set():
+            return call.result
+        return func(*args, **kwargs)
+
+    try:
+        call.result = _shared_call(key, func, args, kwargs)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.event.set()
+
+
+async def _a_shared_call(key, func, args, kwargs):
+    lock_key, result_key = _lock_key(key), _result_key(key)
+    if await cache.aadd(lock_key, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+        try:
+            result = await func(*args, **kwargs)
+            await cache.aset(
+                result_key, {"value": result}, SINGLE_FLIGHT_RESULT_TIMEOUT
+            )
+            return result
+        finally:
+            await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        shared = await cache.aget(result_key)
+        if shared is not None:
+            return shared["value"]
+        if not await cache.aget(lock_key):
+            shared = await cache.aget(result_key)
+            if shared is not None:
+                return shared["value"]
+            break
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+    return await func(*args, **kwargs)
+
+
+async def a_single_flight(key, func, *args, **kwargs):
+    """
+    نسخه async single_flight، func باید coroutine function باشد
+    """
+    loop = asyncio.get_running_loop()
+    loop_calls = _async_calls.setdefault(loop, {})
+    future = loop_calls.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = loop_calls[key] = loop.create_future()
+    try:
+        result = await _a_shared_call(key, func, args, kwargs)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        # mark retrieved, followers may not exist
+        future.exception()
+        raise
+    finally:
+        if not future.done():
+            # leader was cancelled
+            future.cancel()
+        loop_calls.pop(key, None)
@@ -0,0 +1,252 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from decouple import config
+from django.core.cache import cache
+
+from base.utils.metrics import get_counters, hit_ratio, incr_counter
+from base.utils.redis_conn import get_redis
+
+TIERED_CACHE_LOCAL_SIZE = config(
+    "TIERED_CACHE_LOCAL_SIZE", cast=int, default=256
+)  # entries per namespace in each worker
+TIERED_CACHE_LOCAL_TIMEOUT = config(
+    "TIERED_CACHE_LOCAL_TIMEOUT", cast=int, default=30
+)  # seconds, bounds staleness when an invalidation message is missed
+TIERED_CACHE_TIMEOUT = config("TIERED_CACHE_TIMEOUT", cast=int, default=3600)
+TIERED_CACHE_CHANNEL = "tiered_cache:invalidate"
+TIERED_CACHE_STATS_FLUSH = 10.0  # seconds between two pushes of local counters
+
+STAT_NAMES = ("local_hits", "redis_hits", "misses")
+
+_MISSING = object()
+
+
+class TieredCache:
+    """
+    کش دو لایه: LRU داخل حافظه هر ورکر جلوی redis
+    کلیدهای redis نسخه namespace را دارند، invalidate نسخه را بالا می‌برد
+    و با pub/sub حافظه محلی همه ورکرها را پاک می‌کند
+    """
+
+    def __init__(
+        self,
+        namespace,
+        timeout=TIERED_CACHE_TIMEOUT,
+        local_size=TIERED_CACHE_LOCAL_SIZE,
+        local_timeout=TIERED_CACHE_LOCAL_TIMEOUT,
+    ):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.local_size = local_size
+        self.local_timeout = local_timeout
+        self._lock = threading.Lock()
+        self._reset()
+        _caches[namespace] = self
+
+    def _reset(self):
+        self._local = OrderedDict()
+        self._version = None
+        self._version_expires = 0.0
+        # bumped on every invalidation, a read that started before it is not stored
+        self._generation = 0
+        self._stats = Counter()
+        self._stats_flushed_at = time.monotonic()
+
+    def _version_key(self):
+        return f"tiered_cache:version:{self.namespace}"
+
+    def _redis_key(self, version, key):
+        return f"tiered_cache:{self.namespace}:{version}:{key}"
+
+    def version(self):
+        """
+        نسخه فعلی namespace (برای کلیدها و ETag)
+        """
+        _ensure_listener()
+        now = time.monotonic()
+        if self._version is not None and now < self._version_expires:
+            return self._version
+
+        generation = self._generation
+        redis = get_redis()
+        version = redis.get(self._version_key())
+        if version is None:
+            self._seed_version(redis)
+            version = redis.get(self._version_key())
+        version = int(version)
+        with self._lock:
+            if generation == self._generation:
+                self._version = version
+                self._version_expires = now + self.local_timeout
+        return version
+
+    def _seed_version(self, redis):
+        # a lost key (flush, eviction) must not restart at a version an old ETag has
+        redis.set(self._version_key(), time.time_ns(), nx=True)
+
+    def _count(self, name):
+        self._stats[name] += 1
+        now = time.monotonic()
+        if now - self._stats_flushed_at < TIERED_CACHE_STATS_FLUSH:
+            return
+        self._stats_flushed_at = now
+        stats, self._stats = self._stats, Counter()
+        try:
+            for stat, value in stats.items():
+                incr_counter(f"tiered_cache:{self.namespace}:{stat}", value)
+        except Exception as e:
+            logging.warning("failed to push tiered cache stats", exc_info=e)
+
+    def _get_local(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            return value
+
+    def _set_local(self, generation, local_key, value):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._local[local_key] = (time.monotonic() + self.local_timeout, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key, default=None):
+        version = self.version()
+        local_key = (version, key)
+        value = self._get_local(local_key)
+        if value is not _MISSING:
+            self._count("local_hits")
+            return value
+
+        generation = self._generation
+        value = cache.get(self._redis_key(version, key), _MISSING)
+        if value is _MISSING:
+            self._count("misses")
+            return default
+        self._count("redis_hits")
+        self._set_local(generation, local_key, value)
+        return value
+
+    def set(self, key, value, timeout=None):
+        generation = self._generation
+        version = self.version()
+        cache.set(self._redis_key(version, key), value, timeout or self.timeout)
+        self._set_local(generation, (version, key), value)
+
+    def get_or_set(self, key, func, timeout=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            self.set(key, value, timeout)
+        return value
+
+    def clear_local(self, version=None):
+        with self._lock:
+            self._local.clear()
+            self._generation += 1
+            self._version = version
+            self._version_expires = (
+                time.monotonic() + self.local_timeout if version is not None else 0.0
+            )
+
+    def invalidate(self):
+        """
+        نسخه جدید در redis و پیام به همه ورکرها، کلیدهای قبلی با timeout منقضی می‌شوند
+        """
+        redis = get_redis()
+        self._seed_version(redis)
+        version = redis.incr(self._version_key())
+        self.clear_local(version)
+        redis.publish(TIERED_CACHE_CHANNEL, f"{self.namespace}:{version}")
+        return version
+
+    def stats(self):
+        names = [f"tiered_cache:{self.namespace}:{stat}" for stat in STAT_NAMES]
+        counters = dict(zip(STAT_NAMES, get_counters(*names).values()))
+        counters["hit_ratio"] = hit_ratio(
+            counters["local_hits"] + counters["redis_hits"], counters["misses"]
+        )
+        counters["local_hit_ratio"] = hit_ratio(
+            counters["local_hits"], counters["redis_hits"] + counters["misses"]
+        )
+        counters["local_entries"] = len(self._local)
+        return counters
+
+
+_caches = {}
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _handle_message(data):
+    namespace, _, version = data.decode().rpartition(":")
+    tiered_cache = _caches.get(namespace)
+    if tiered_cache is not None:
+        tiered_cache.clear_local(int(version))
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(TIERED_CACHE_CHANNEL)
+            # messages published while we were not subscribed are lost
+            for tiered_cache in list(_caches.values()):
+                tiered_cache.clear_local()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    _handle_message(message["data"])
+        except Exception as e:
+            logging.warning("tiered cache listener failed", exc_info=e)
+            time.sleep(1)
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=_listen, name="tiered-cache-listener", daemon=True
+            )
+            _listener.start()
+
+
+def _reset_after_fork():
+    global _listener, _listener_lock
+    # threads do not survive fork, every worker starts its own listener
+    _listener = None
+    _listener_lock = threading.Lock()
+    for tiered_cache in _caches.values():
+        tiered_cache._lock = threading.Lock()
+        tiered_cache._reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_tiered_cache(namespace, **kwargs):
+    tiered_cache = _caches.get(namespace)
+    if tiered_cache is None:
+        tiered_cache = TieredCache(namespace, **kwargs)
+    return tiered_cache
+
+
+def tiered_cache_stats():
+    return {
+        namespace: tiered_cache.stats() for namespace, tiered_cache in _caches.items()
+    }